@@ -1,10 +1,14 @@
 from flask import Flask, request, jsonify, render_template, send_file
 import os
-import PyPDF2
-from PIL import Image
-import pytesseract
-from core.pipeline import run_full_pipeline
-from database import setup_database, get_result_by_filename, upsert_verified_data
+import threading
+from core.content_store import store_upload
+from core.extract import SUPPORTED_EXTS, get_or_extract_text
+from core.jobs import JobQueue
+from core.models import registry, preload_models
+from core.vendor_master import vendor_master
+from database import (setup_database, close_connections, get_result_by_filename, upsert_verified_data, get_job, get_latest_job_by_filename,
+                      list_results, get_invoice_history, find_result_by_content_hash, link_result,
+                      list_duplicate_clusters)
 
 app = Flask(__name__)
 
@@ -12,7 +16,28 @@ UPLOAD_DIR = 'uploads'
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
-setup_database()
+job_queue = None
+_init_lock = threading.Lock()
+
+def init_app():
+    """Create the database schema, start the job workers and begin preloading models, once. Deferred
+    to the first request so importing the app (workers, CLI tools, tests) stays cheap."""
+    global job_queue
+    with _init_lock:
+        if job_queue is None:
+            setup_database()
+            job_queue = JobQueue()
+            preload_models()
+    return job_queue
+
+@app.before_request
+def _ensure_initialized():
+    if job_queue is None:
+        init_app()
+
+@app.teardown_appcontext
+def _close_db(exc):
+    close_connections()
 
 @app.route('/')
 def index():
@@ -26,54 +51,101 @@ def upload_file():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
 
-    if file:
-        filepath = os.path.join(UPLOAD_DIR, file.filename)
-        print(f"Saving file to: {filepath}")
-        file.save(filepath)
-        print(f"File saved successfully: {os.path.exists(filepath)}")
+    if not file.filename.lower().endswith(SUPPORTED_EXTS):
+        return jsonify({"error": "Unsupported file type"}), 400
 
-        text_content = ""
-        try:
-            if file.filename.lower().endswith('.pdf'):
-                with open(filepath, "rb") as f:
-                    reader = PyPDF2.PdfReader(f)
-                    for page in reader.pages:
-                        page_text = None
-                        try:
-                            page_text = page.extract_text()
-                        except Exception:
-                            page_text = None
-                        if page_text:
-                            text_content += page_text
-            elif file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                text_content = pytesseract.image_to_string(Image.open(filepath))
-            else:
-                 return jsonify({"error": "Unsupported file type"}), 400
-        except Exception as e:
-            return jsonify({"error": f"Failed to read file content: {e}"}), 500
-        
-        run_full_pipeline(filepath, text_content)
+    filepath, content_hash = store_upload(file.stream, file.filename, UPLOAD_DIR)
+    print(f"Saved file to: {filepath} (sha256 {content_hash[:12]})")
+
+    # Byte-identical to a document already processed: reuse its result instead of running any tier
+    source = find_result_by_content_hash(content_hash)
+    if source:
+        result = link_result(source, filepath)
+        result['duplicate_of_file'] = source['filename']
+        print(f"{file.filename} has the same content as {source['filename']}, reusing its result")
+        return jsonify(result), 200
 
-        # Try to fetch parsed data immediately
-        parsed = get_result_by_filename(file.filename)
-        if parsed and parsed.get('status') != 'FAILED':
-            return jsonify(parsed), 200
+    # Text extraction and the tier pipeline run on the job pool; the client polls results_url
+    job_id = job_queue.submit(filepath, content_hash)
+    return jsonify({
+        "message": "File received; processing deferred",
+        "job_id": job_id,
+        "filename": file.filename,
+        "results_url": f"/results/{file.filename}",
+        "job_url": f"/jobs/{job_id}"
+    }), 202
 
-        # Fallback – provide polling URL
-        return jsonify({
-            "message": "File received; processing deferred",
-            "filename": file.filename,
-            "results_url": f"/results/{file.filename}"
-        }), 202
+@app.route('/results', methods=['GET'])
+def list_results_page():
+    """List results newest first. Filters: status, processing_tier, vendor_gstin, verified
+    (true/false), since/until (extracted_at). Pass next_cursor back as cursor for the next page."""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    filters = {k: request.args.get(k) for k in ('status', 'processing_tier', 'vendor_gstin', 'since', 'until')}
+    verified = request.args.get('verified')
+    if verified is not None:
+        filters['verified'] = verified.lower() in ('1', 'true', 'yes')
+    results, next_cursor = list_results(filters, limit, cursor)
+    return jsonify({"results": results, "next_cursor": next_cursor}), 200
 
 @app.route('/results/<filename>', methods=['GET'])
 def get_results(filename):
     """New endpoint to retrieve processing results from the database."""
+    job = get_latest_job_by_filename(filename)
+    if job and job['state'] in ('queued', 'running'):
+        return jsonify({"message": "Processing", "job": job}), 202
     result = get_result_by_filename(filename)
     if result:
         return jsonify(result), 200
-    else:
-        return jsonify({"error": "Results not found or still processing."}), 404
+    if job and job['state'] == 'failed':
+        return jsonify({"error": f"Processing failed: {job.get('error')}", "job": job}), 500
+    return jsonify({"error": "Results not found or still processing."}), 404
+
+@app.route('/duplicates', methods=['GET'])
+def get_duplicate_clusters():
+    """List invoices flagged as duplicates, grouped under the invoice they duplicate. Pass
+    next_cursor back as cursor for the next page."""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    clusters, next_cursor = list_duplicate_clusters(limit, cursor)
+    return jsonify({"clusters": clusters, "next_cursor": next_cursor}), 200
+
+@app.route('/results/<filename>/history', methods=['GET'])
+def get_results_history(filename):
+    """Every tier's output and timing for a file, when INVOICE_HISTORY is enabled."""
+    return jsonify(get_invoice_history(filename)), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report the state and per-tier timestamps of an upload job."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/models', methods=['GET'])
+def get_model_status():
+    """Report load state and load time of the OCR/QA models."""
+    return jsonify(registry.status()), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Report OCR/LLM cache counters, how much text LLM prompt pruning left out, the state of
+    the LLM circuit breaker, the database write-behind queue and vendor master hits."""
+    from core.llm_cache import get_llm_cache
+    from core.llm_client import get_llm_client
+    from core.ocr_cache import get_ocr_cache
+    from core.prompt import prompt_stats
+    from database import writer
+    return jsonify({"llm_cache": get_llm_cache().stats(), "ocr_cache": get_ocr_cache().stats(),
+                    "llm_prompt": prompt_stats(), "llm_circuit": get_llm_client().breaker.stats(),
+                    "db_writer": writer.stats(), "vendor_master": vendor_master.stats()}), 200
 
 @app.route('/verify/<filename>', methods=['POST'])
 def verify_data(filename):
@@ -83,7 +155,8 @@ def verify_data(filename):
         if not verified_data:
             return jsonify({"error": "No data provided"}), 400
         
-        upsert_verified_data(filename, verified_data)
+        if upsert_verified_data(filename, verified_data):
+            vendor_master.invalidate()
         return jsonify({"message": "Data verified and updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to update data: {str(e)}"}), 500
@@ -104,24 +177,11 @@ def reparse_file(filename):
         if not os.path.exists(filepath):
             return jsonify({"error": "File not found"}), 404
         
-        # Read file content again
-        text_content = ""
+        # Text layer stored at upload time; only re-extracted if missing
         try:
-            if filename.lower().endswith('.pdf'):
-                with open(filepath, "rb") as f:
-                    reader = PyPDF2.PdfReader(f)
-                    for page in reader.pages:
-                        page_text = None
-                        try:
-                            page_text = page.extract_text()
-                        except Exception:
-                            page_text = None
-                        if page_text:
-                            text_content += page_text
-            elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                text_content = pytesseract.image_to_string(Image.open(filepath))
-            else:
-                return jsonify({"error": "Unsupported file type"}), 400
+            text_content = get_or_extract_text(filepath)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": f"Failed to read file content: {e}"}), 500
         
@@ -153,8 +213,9 @@ def reparse_file(filename):
             # Add metadata and save to database
             result['file_path'] = filepath
             result.setdefault('status', 'SUCCESS' if result.get('vendor_name') and result.get('total_amount') else 'PARTIAL')
-            from database import save_to_db
+            from database import save_to_db, flush_writes
             save_to_db(result)
+            flush_writes()
             
             # Return the new result
             updated_result = get_result_by_filename(filename)
@@ -198,4 +259,8 @@ def serve_uploaded_file(filename):
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
+    # the debug reloader runs this file twice; only the serving child (WERKZEUG_RUN_MAIN) starts the
+    # workers and preloads models, the watching parent never serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_app()
     app.run(debug=True)
\ No newline at end of file
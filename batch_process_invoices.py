@@ -1,9 +1,14 @@
+import argparse
+import json
 import os
-import PyPDF2
-from PIL import Image
-import pytesseract
-from core.pipeline import run_full_pipeline
-from database import setup_database, get_result_by_filename
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Set, Tuple
+from core.config import DOCTR_BATCH_SIZE
+from core.extract import SUPPORTED_EXTS, get_or_extract_text
+from core.utils import file_sha256
+from core.pipeline import run_pipelines
+from database import setup_database, get_result_by_filename, flush_writes, WriteBehindError
 
 INVOICE_DIR = 'invoices'
 UPLOAD_DIR = 'uploads'
@@ -14,45 +19,229 @@ def ensure_dirs():
         os.makedirs(UPLOAD_DIR)
 
 
-def extract_text_for_file(src_path: str) -> str:
-    text_content = ''
+def extract_text_for_file(src_path: str, content_hash: Optional[str] = None) -> str:
     try:
-        lower = src_path.lower()
-        if lower.endswith('.pdf'):
-            with open(src_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text_content += page.extract_text() or ''
-        elif lower.endswith(('.png', '.jpg', '.jpeg')):
-            text_content = pytesseract.image_to_string(Image.open(src_path))
+        text_content = get_or_extract_text(src_path, content_hash)
     except Exception as e:
         print(f"Failed to extract text from {src_path}: {e}")
+        text_content = ''
     return text_content
 
 
-def process_all():
-    setup_database()
-    ensure_dirs()
-    for fname in os.listdir(INVOICE_DIR):
-        src_path = os.path.join(INVOICE_DIR, fname)
-        if not os.path.isfile(src_path):
+def _manifest_key(src_path: str) -> str:
+    st = os.stat(src_path)
+    return f"{os.path.basename(src_path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def load_manifest(manifest_path: str) -> Set[str]:
+    done: Set[str] = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                done.add(line)
+    return done
+
+
+def init_worker():
+    """Load the configured models (MODEL_PRELOAD) once per worker process instead of once per file."""
+    from core.config import MODEL_PRELOAD
+    from core.models import registry
+    for name in MODEL_PRELOAD:
+        registry.get(name)
+
+
+def _copy_to_uploads(src_path: str) -> str:
+    fname = os.path.basename(src_path)
+    dest_path = os.path.join(UPLOAD_DIR, fname)
+    if not os.path.exists(dest_path):
+        # copy file into uploads for consistency
+        try:
+            with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+                dst.write(src.read())
+        except Exception as e:
+            print(f"Could not copy {fname} to uploads: {e}")
+    return dest_path
+
+
+def process_files(src_paths: List[str]) -> List[Dict[str, Any]]:
+    """Process a chunk of files. In a chunk of several, documents the RegexOnly tier cannot finish
+    are OCR'd together in one batched DocTR call first, so the pipeline picks them up from the OCR cache,
+    and the ones reaching Text_QA share one batched QA call."""
+    from core.pipeline import regex_tier
+    from core.ocr_cache import cached_process_with_doctr_batch
+    records: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    dest_paths: List[str] = []
+    for src_path in src_paths:
+        dest_path = _copy_to_uploads(src_path)
+        t0 = time.perf_counter()
+        try:
+            content_hash = file_sha256(dest_path)
+        except OSError:
+            content_hash = None
+        text = extract_text_for_file(dest_path, content_hash)
+        extract_secs = time.perf_counter() - t0
+        records.append({'filename': os.path.basename(src_path), 'timings': {'extract': extract_secs},
+                        'elapsed': extract_secs, 'content_hash': content_hash})
+        texts.append(text)
+        dest_paths.append(dest_path)
+    # the RegexOnly result decides who needs DocTR, and the pipeline reuses it
+    regex: List[Optional[tuple]] = [None] * len(texts)
+    if len(texts) > 1:
+        for i, text in enumerate(texts):
+            t0 = time.perf_counter()
+            regex[i] = regex_tier(text)
+            records[i]['elapsed'] += time.perf_counter() - t0
+    ocr_idx = [i for i, r in enumerate(regex) if r is not None and not r[1]]
+    if len(ocr_idx) > 1:
+        t0 = time.perf_counter()
+        try:
+            cached_process_with_doctr_batch([dest_paths[i] for i in ocr_idx],
+                                            content_hashes=[records[i]['content_hash'] for i in ocr_idx])
+        except Exception as e:
+            print(f"Batched DocTR failed, falling back to per-document OCR: {e}")
+        share = (time.perf_counter() - t0) / len(ocr_idx)
+        for i in ocr_idx:
+            records[i]['timings']['doctr_batch'] = share
+            records[i]['elapsed'] += share
+    runs = []
+    for record, dest_path, text, regex_result in zip(records, dest_paths, texts, regex):
+        timings = record['timings']
+        started: Dict[str, float] = {}
+
+        def progress(tier: str, event: str, timings=timings, started=started):
+            if event == 'started':
+                started[tier] = time.perf_counter()
+            elif tier in started:
+                timings[tier] = time.perf_counter() - started.pop(tier)
+
+        # extraction and the shared OCR batch count against the invoice's latency budget
+        runs.append({'image_path': dest_path, 'text_content': text, 'progress': progress,
+                     'content_hash': record['content_hash'], 'regex_result': regex_result,
+                     'spent': record['elapsed']})
+    # documents reaching Text_QA are answered together in one batched call
+    outcomes = run_pipelines(runs)
+    unsaved: Dict[str, str] = {}
+    try:
+        flush_writes()
+    except WriteBehindError as e:
+        unsaved = e.failures
+    for record, dest_path, outcome in zip(records, dest_paths, outcomes):
+        record['elapsed'] += outcome['seconds']
+        error = str(outcome['error']) if outcome['error'] is not None else unsaved.get(dest_path)
+        if error is not None:
+            record['error'] = error
             continue
-        if not fname.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg')):
+        try:
+            record['result'] = get_result_by_filename(record['filename'])
+        except Exception as e:
+            record['error'] = str(e)
+    return records
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def print_summary(records: List[Dict[str, Any]], wall_time: float):
+    print(f"\nProcessed {len(records)} file(s) in {wall_time:.1f}s "
+          f"({len(records) / wall_time if wall_time else 0:.2f} files/s)")
+    if not records:
+        return
+    per_tier: Dict[str, List[float]] = {}
+    final_tiers: Dict[str, int] = {}
+    for rec in records:
+        per_tier.setdefault('total', []).append(rec['elapsed'])
+        for tier, secs in rec.get('timings', {}).items():
+            per_tier.setdefault(tier, []).append(secs)
+        tier = (rec.get('result') or {}).get('processing_tier') or ('ERROR' if rec.get('error') else 'NONE')
+        final_tiers[tier] = final_tiers.get(tier, 0) + 1
+    print(f"{'stage':<14}{'runs':>6}{'mean s':>10}{'p50 s':>10}{'p95 s':>10}")
+    for tier, values in per_tier.items():
+        print(f"{tier:<14}{len(values):>6}{sum(values) / len(values):>10.3f}"
+              f"{_percentile(values, 50):>10.3f}{_percentile(values, 95):>10.3f}")
+    print('Final tiers:', ', '.join(f"{k}={v}" for k, v in sorted(final_tiers.items())))
+
+
+def _pending_files(input_dir: str, done: Set[str]) -> List[Tuple[str, str]]:
+    pending = []
+    for fname in sorted(os.listdir(input_dir)):
+        src_path = os.path.join(input_dir, fname)
+        if not os.path.isfile(src_path) or not fname.lower().endswith(SUPPORTED_EXTS):
             continue
-        dest_path = os.path.join(UPLOAD_DIR, fname)
-        if not os.path.exists(dest_path):
-            # copy file into uploads for consistency
-            try:
-                with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
-                    dst.write(src.read())
-            except Exception as e:
-                print(f"Could not copy {fname} to uploads: {e}")
-        print(f"Processing {fname}...")
-        text = extract_text_for_file(dest_path)
-        run_full_pipeline(dest_path, text)
-        result = get_result_by_filename(fname)
-        print('Result:', result)
+        key = _manifest_key(src_path)
+        if key not in done:
+            pending.append((src_path, key))
+    return pending
+
+
+def process_all(input_dir: str = INVOICE_DIR, workers: int = 1, output_path: str = 'batch_results.jsonl',
+                manifest_path: str = None, ordered: bool = False, resume: bool = True,
+                batch_size: int = DOCTR_BATCH_SIZE):
+    setup_database()
+    ensure_dirs()
+    manifest_path = manifest_path or f"{output_path}.manifest"
+    if not resume:
+        for p in (output_path, manifest_path):
+            if os.path.exists(p):
+                os.remove(p)
+    done = load_manifest(manifest_path)
+    pending = _pending_files(input_dir, done)
+    print(f"{len(pending)} file(s) to process, {len(done)} already done")
+    keys = {src: key for src, key in pending}
+    records: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with open(output_path, 'a', encoding='utf-8') as out, open(manifest_path, 'a', encoding='utf-8') as manifest:
+        def emit(src_path: str, record: Dict[str, Any]):
+            out.write(json.dumps(record, default=str) + '\n')
+            out.flush()
+            if not record.get('error'):
+                manifest.write(keys[src_path] + '\n')
+                manifest.flush()
+                os.fsync(manifest.fileno())
+            records.append(record)
+            status = record.get('error') or (record.get('result') or {}).get('processing_tier')
+            print(f"{record['filename']}: {status} ({record['elapsed']:.2f}s)")
+
+        srcs = [src for src, _ in pending]
+        chunks = [srcs[i:i + batch_size] for i in range(0, len(srcs), batch_size)]
+        if workers <= 1:
+            for chunk in chunks:
+                for src_path, record in zip(chunk, process_files(chunk)):
+                    emit(src_path, record)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                if ordered:
+                    for chunk, chunk_records in zip(chunks, pool.map(process_files, chunks)):
+                        for src_path, record in zip(chunk, chunk_records):
+                            emit(src_path, record)
+                else:
+                    futures = {pool.submit(process_files, chunk): chunk for chunk in chunks}
+                    for fut in as_completed(futures):
+                        for src_path, record in zip(futures[fut], fut.result()):
+                            emit(src_path, record)
+    print_summary(records, time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every invoice in a folder through the tier pipeline.')
+    parser.add_argument('--input-dir', default=INVOICE_DIR)
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (models load once per worker)')
+    parser.add_argument('--output', default='batch_results.jsonl', help='JSONL file results are streamed to')
+    parser.add_argument('--manifest', default=None, help='Checkpoint of finished files (default: <output>.manifest)')
+    parser.add_argument('--ordered', action='store_true', help='Emit results in input order instead of completion order')
+    parser.add_argument('--batch-size', type=int, default=DOCTR_BATCH_SIZE,
+                        help='Files per worker task; images needing OCR in a task share one DocTR call')
+    parser.add_argument('--restart', action='store_true', help='Ignore and overwrite an existing checkpoint')
+    args = parser.parse_args()
+    process_all(args.input_dir, args.workers, args.output, args.manifest, args.ordered,
+                resume=not args.restart, batch_size=max(1, args.batch_size))
 
 
 if __name__ == '__main__':
-    process_all()
+    main()
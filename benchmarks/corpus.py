@@ -0,0 +1,55 @@
+"""Deterministic synthetic invoice texts for the micro-benchmarks."""
+import random
+
+VENDORS = ["ACME TRADERS PVT LTD", "Sunrise Enterprises Private Limited", "GLOBAL FOODS LLP",
+           "Shree Ganesh Co", "RAINBOW TEXTILES", "Blue Ocean Inc", "Om Sai Agencies"]
+ADDRESSES = ["12, MG Road, Bengaluru", "Shop No. 4, Market Complex", "Plot 22 Sector 5, Noida",
+             "Near City Mall, Pune 411001", "Tower B, 3rd Floor"]
+DATES = ["12-Mar-24", "03/04/2023", "2024-01-15", "5-January-2023", "12 March 2024", "01-Feb-2022",
+         "31/12/2021", "7-Sep-23", "15.01.2024", "March 5, 2024"]
+ITEMS = ['Rice', 'Soap', 'Widget', 'Cable', 'Paint', 'Bolt']
+
+
+def _gstin(rng: random.Random) -> str:
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return ("%02d" % rng.randint(1, 37) + ''.join(rng.choice(letters) for _ in range(5))
+            + "%04d" % rng.randint(0, 9999) + rng.choice(letters) + rng.choice('123456789') + 'Z'
+            + rng.choice('0123456789ABC'))
+
+
+def make_invoice(rng: random.Random, n_items: int) -> str:
+    vendor = rng.choice(VENDORS)
+    lines = ["TAX INVOICE", vendor, rng.choice(ADDRESSES), "GSTIN/UIN: " + _gstin(rng),
+             "Invoice No. : INV-%d" % rng.randint(100, 99999), "Dated " + rng.choice(DATES[:3]),
+             "Buyer (Bill to)", "Foo Retail", "Customer GSTIN " + _gstin(rng),
+             "Sl Description Qty Rate Amount"]
+    total = 0
+    for i in range(n_items):
+        qty, rate = rng.randint(1, 50), rng.randint(10, 5000)
+        total += qty * rate
+        lines.append(f"{i + 1} {rng.choice(ITEMS)} {qty} {rate:,}.00 {qty * rate:,}.00")
+    lines += [f"Sub Total {total:,}.00", f"Grand Total ₹ {total * 1.18:,.2f}",
+              "Amount Chargeable (in words) INR Only", "For " + vendor]
+    return '\n'.join(lines)
+
+
+def date_strings(count: int = 2000, seed: int = 11):
+    """Date strings in the shapes the extractors and models return, a few of them only dateutil handles"""
+    rng = random.Random(seed)
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    full = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+            'October', 'November', 'December']
+    out = []
+    for _ in range(count):
+        y, m, d = rng.randint(2018, 2026), rng.randint(1, 12), rng.randint(1, 28)
+        out.append(rng.choice([
+            f"{d:02d}-{months[m - 1]}-{y % 100:02d}", f"{d}-{months[m - 1]}-{y}", f"{d:02d}/{m:02d}/{y}",
+            f"{y}-{m:02d}-{d:02d}", f"{d} {full[m - 1]} {y}", f"{full[m - 1]} {d}, {y}", f"{d:02d}.{m:02d}.{y}",
+            f"{d}th {full[m - 1]} {y}", f"{d:02d}-{m:02d}-{y % 100:02d}",
+        ]))
+    return out
+
+
+def invoice_corpus(count: int = 50, n_items: int = 300, seed: int = 7):
+    rng = random.Random(seed)
+    return [make_invoice(rng, n_items) for _ in range(count)]
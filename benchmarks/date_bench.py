@@ -0,0 +1,38 @@
+"""Micro-benchmark for date normalization: fast-path parser vs dateutil fuzzy parsing.
+
+    python -m benchmarks.date_bench [--count 2000] [--repeat 5]
+"""
+import argparse
+import time
+from core.dates import normalize_date, parse_with_dateutil
+from benchmarks.corpus import DATES, date_strings
+
+
+def _best(fn, strings, repeat, before=None):
+    best = None
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        for s in strings:
+            fn(s)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(strings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    strings = DATES + date_strings(args.count)
+    mismatches = [s for s in strings if normalize_date(s) != parse_with_dateutil(s)]
+    print(f"dateutil fuzzy:  {_best(parse_with_dateutil, strings, args.repeat):.1f} us/date")
+    print(f"fast path, cold: {_best(normalize_date, strings, args.repeat, normalize_date.cache_clear):.1f} us/date")
+    print(f"fast path, warm: {_best(normalize_date, strings, args.repeat):.1f} us/date")
+    print(f"{len(strings)} strings, {len(mismatches)} disagreement(s)" + (f": {mismatches[:5]}" if mismatches else ''))
+
+
+if __name__ == '__main__':
+    main()
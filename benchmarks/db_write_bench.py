@@ -0,0 +1,55 @@
+"""Invoice upsert throughput: synchronous saves vs the write-behind writer, from several threads.
+
+    python -m benchmarks.db_write_bench [--threads 8] [--invoices 500] [--saves-per-invoice 3]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import database
+
+
+def _save_all(db_name: str, names, saves: int, write_behind: bool):
+    for name in names:
+        for tier in ('RegexOnly', 'Regex+DocTR', 'LLM')[:saves]:
+            row = database._invoice_params({'file_path': f"uploads/{name}", 'vendor_name': 'Acme Ltd',
+                                            'total_amount': 100.0, 'processing_tier': tier})
+            if write_behind:
+                database.writer.submit(db_name, row)
+            else:
+                database._write_invoices(db_name, [row])
+
+
+def run(db_name: str, threads: int, invoices: int, saves: int, write_behind: bool) -> float:
+    names = [f"bench_{write_behind}_{i}.pdf" for i in range(invoices)]
+    chunks = [names[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=_save_all, args=(db_name, chunk, saves, write_behind)) for chunk in chunks]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    database.flush_writes()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--invoices', type=int, default=500)
+    parser.add_argument('--saves-per-invoice', type=int, default=3, choices=(1, 2, 3))
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        database.setup_database(db_name)
+        writes = args.invoices * args.saves_per_invoice
+        for label, write_behind in (('synchronous', False), ('write-behind', True)):
+            elapsed = run(db_name, args.threads, args.invoices, args.saves_per_invoice, write_behind)
+            print(f"{label}: {writes / elapsed:.0f} saves/s ({writes} saves from {args.threads} threads in {elapsed:.2f}s)")
+        rows = database.get_connection(db_name).execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+        print(f"rows: {rows}, writer: {database.writer.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Micro-benchmark for the keyword line heuristics (is_company_like_line, is_output_valid).
+
+    python -m benchmarks.keyword_bench [--docs 50] [--header-lines 40] [--repeat 5]
+"""
+import argparse
+import time
+from core.keywords import keyword_hits
+from core.pipeline import is_output_valid
+from core.utils import is_company_like_line
+from benchmarks.corpus import invoice_corpus
+
+
+def _run(lines):
+    for ln in lines:
+        if is_company_like_line(ln):
+            is_output_valid({'vendor_name': ln, 'total_amount': 1.0})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=50)
+    parser.add_argument('--header-lines', type=int, default=40, help='Leading lines per invoice to classify')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    lines = [ln.strip() for text in invoice_corpus(args.docs, 30)
+             for ln in text.splitlines()[:args.header_lines] if ln.strip()]
+    for label, clear in (('cold', True), ('warm', False)):
+        best = None
+        for _ in range(args.repeat):
+            if clear:
+                keyword_hits.cache_clear()
+            t0 = time.perf_counter()
+            _run(lines)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label}: {best / len(lines) * 1e6:.2f} us/line (best of {args.repeat}, {len(lines)} lines)")
+
+
+if __name__ == '__main__':
+    main()
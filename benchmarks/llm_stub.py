@@ -0,0 +1,116 @@
+"""Local stand-in for an OpenAI-compatible /chat/completions endpoint, for exercising the LLM client
+without network access or API keys.
+
+    python -m benchmarks.llm_stub [--port 8765] [--delay 0.05] [--fail-every 5] [--fail-first 0] [--retry-after 0]
+
+Point the app at it with LLM_API_URL=http://127.0.0.1:8765/v1/chat/completions (any GROQ_API_KEY).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INVOICE_JSON = json.dumps({"vendor_name": "ACME TRADERS PVT LTD", "invoice_number": "INV-1001",
+                           "invoice_date": "2024-03-12", "total_amount": 1180.0,
+                           "vendor_gstin": "27ABCDE1234F1Z5", "customer_gstin": None})
+
+
+class StubState:
+    def __init__(self, delay: float = 0.0, fail_every: int = 0, fail_status: int = 429,
+                 retry_after: str = '0', fail_first: int = 0):
+        self.delay = delay
+        self.fail_every = fail_every
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+def _handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so pooled clients reuse connections
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers=None):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            with state.lock:
+                state.requests += 1
+                n = state.requests
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                time.sleep(state.delay)
+                if not self.path.endswith('/chat/completions'):
+                    self._send(404, {'error': 'not found'})
+                elif n <= state.fail_first or (state.fail_every and n % state.fail_every == 0):
+                    with state.lock:
+                        state.failures += 1
+                    self._send(state.fail_status, {'error': {'message': 'stub failure'}},
+                               {'Retry-After': state.retry_after} if state.retry_after else None)
+                else:
+                    self._send(200, {'id': f'stub-{n}', 'object': 'chat.completion', 'model': payload.get('model'),
+                                     'choices': [{'index': 0, 'finish_reason': 'stop',
+                                                  'message': {'role': 'assistant', 'content': INVOICE_JSON}}]})
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def start_stub(port: int = 0, **options):
+    """Start the stub on a daemon thread; returns (server, state). The URL is
+    http://127.0.0.1:<server.server_address[1]>/v1/chat/completions"""
+    state = StubState(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), _handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.05, help='Seconds per response')
+    parser.add_argument('--fail-every', type=int, default=0, help='Fail every Nth request (0 never)')
+    parser.add_argument('--fail-first', type=int, default=0, help='Fail the first N requests')
+    parser.add_argument('--fail-status', type=int, default=429)
+    parser.add_argument('--retry-after', default='0', help="Retry-After header on failures ('' omits it)")
+    args = parser.parse_args()
+    server, _ = start_stub(args.port, delay=args.delay, fail_every=args.fail_every,
+                           fail_status=args.fail_status, retry_after=args.retry_after,
+                           fail_first=args.fail_first)
+    print(f"Stub chat completions at http://127.0.0.1:{server.server_address[1]}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
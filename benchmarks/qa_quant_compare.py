@@ -0,0 +1,96 @@
+"""Compare the fp32 and int8 Text_QA paths on the same invoices: per-document latency, peak RSS and
+field agreement. Each mode runs in its own subprocess so peak RSS is measured separately.
+
+    python -m benchmarks.qa_quant_compare [--input-dir invoices] [--limit 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+FIELDS = ['vendor_name', 'invoice_number', 'invoice_date', 'total_amount', 'vendor_gstin', 'customer_gstin']
+
+
+def _load_texts(input_dir: str, limit: int):
+    from core.extract import SUPPORTED_EXTS, extract_text
+    texts = {}
+    for fname in sorted(os.listdir(input_dir)):
+        if not fname.lower().endswith(SUPPORTED_EXTS):
+            continue
+        try:
+            texts[fname] = extract_text(os.path.join(input_dir, fname))[0]
+        except Exception as e:
+            print(f"Skipping {fname}: {e}")
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def run_mode(texts_path: str, out_path: str):
+    """Child process: QA_QUANTIZE is already set in the environment before core is imported"""
+    import resource
+    from core.qa import _get_qa_pipeline, process_with_text_qa
+    with open(texts_path, 'r', encoding='utf-8') as f:
+        texts = json.load(f)
+    t0 = time.perf_counter()
+    if _get_qa_pipeline() is None:
+        raise SystemExit('QA model could not be loaded')
+    load_secs = time.perf_counter() - t0
+    answers, latencies = {}, []
+    for fname, text in texts.items():
+        t0 = time.perf_counter()
+        answers[fname] = process_with_text_qa(text)
+        latencies.append(time.perf_counter() - t0)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({'load_secs': load_secs, 'latencies': latencies, 'answers': answers,
+                   'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}, f, default=str)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input-dir', default='invoices')
+    parser.add_argument('--limit', type=int, default=20, help='Invoices to compare')
+    parser.add_argument('--child', nargs=2, metavar=('TEXTS', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_mode(*args.child)
+        return
+    texts = _load_texts(args.input_dir, args.limit)
+    if not texts:
+        raise SystemExit(f"No invoices found in {args.input_dir}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, 'texts.json')
+        with open(texts_path, 'w', encoding='utf-8') as f:
+            json.dump(texts, f)
+        for mode in ('none', 'int8'):
+            out_path = os.path.join(tmp, f'{mode}.json')
+            env = dict(os.environ, QA_QUANTIZE=mode)
+            subprocess.run([sys.executable, '-m', 'benchmarks.qa_quant_compare', '--child', texts_path, out_path],
+                           env=env, check=True)
+            with open(out_path, 'r', encoding='utf-8') as f:
+                results[mode] = json.load(f)
+    print(f"\n{len(texts)} invoice(s)")
+    print(f"{'mode':<6}{'load s':>9}{'mean s':>9}{'p50 s':>9}{'p95 s':>9}{'peak RSS MB':>13}")
+    for mode, label in (('none', 'fp32'), ('int8', 'int8')):
+        r = results[mode]
+        lat = r['latencies']
+        print(f"{label:<6}{r['load_secs']:>9.2f}{sum(lat) / len(lat):>9.3f}{_percentile(lat, 50):>9.3f}"
+              f"{_percentile(lat, 95):>9.3f}{r['peak_rss_mb']:>13.0f}")
+    print('\nField agreement (int8 vs fp32):')
+    for field in FIELDS:
+        same = sum(1 for fname in texts
+                   if results['none']['answers'][fname].get(field) == results['int8']['answers'][fname].get(field))
+        print(f"  {field:<16}{same}/{len(texts)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Micro-benchmark for the RegexOnly tier on long invoices.
+
+    python -m benchmarks.regex_bench [--items 300] [--docs 50] [--repeat 5]
+"""
+import argparse
+import time
+from core.regex_extract import process_invoice_regex
+from benchmarks.corpus import invoice_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=300, help='Line items per invoice')
+    parser.add_argument('--docs', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    docs = invoice_corpus(args.docs, args.items)
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        for text in docs:
+            process_invoice_regex(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    avg_chars = sum(len(d) for d in docs) / len(docs)
+    print(f"process_invoice_regex: {best / len(docs) * 1000:.3f} ms/doc "
+          f"(best of {args.repeat}, {len(docs)} docs, ~{avg_chars / 1000:.1f}k chars each)")
+
+
+if __name__ == '__main__':
+    main()
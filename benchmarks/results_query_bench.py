@@ -0,0 +1,71 @@
+"""Seed a large invoices table and time the result lookups the UI and GET /results run.
+
+    python -m benchmarks.results_query_bench [--rows 1000000] [--db bench_results.db] [--repeat 200]
+
+Seeding is skipped when the database already holds at least --rows invoices.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import database
+
+_STATUSES = ('SUCCESS', 'SUCCESS', 'SUCCESS', 'PARTIAL', 'FAILED')
+_TIERS = ('RegexOnly', 'RegexOnly', 'Regex+DocTR', 'Text_QA', 'LLM')
+
+
+def seed(db_name: str, rows: int, batch: int = 50000):
+    conn = database.get_connection(db_name)
+    have = conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+    rng = random.Random(7)
+    start = datetime(2023, 1, 1)
+    t0 = time.perf_counter()
+    for lo in range(have, rows, batch):
+        chunk = []
+        for i in range(lo, min(rows, lo + batch)):
+            filename = f"seed_{i:08d}.pdf"
+            chunk.append((f"uploads/{filename}", filename, f"Vendor {i % 5000} Pvt Ltd", f"INV-{i}",
+                          rng.choice(_STATUSES), rng.choice(_TIERS), rng.random() < 0.2,
+                          round(rng.uniform(50, 500000), 2),
+                          (start + timedelta(seconds=i * 30)).strftime('%Y-%m-%d %H:%M:%S')))
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO invoices (file_path, filename, vendor_name, invoice_number, status, "
+                "processing_tier, verified, total_amount, extracted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+    if rows > have:
+        print(f"seeded {rows - have} rows in {time.perf_counter() - t0:.1f}s")
+
+
+def _time(label: str, fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label}: {(time.perf_counter() - t0) / repeat * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db', default='bench_results.db')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    database.setup_database(args.db)
+    seed(args.db, args.rows)
+    rng = random.Random(11)
+    _time('get_result_by_filename', lambda: database.get_result_by_filename(
+        f"seed_{rng.randrange(args.rows):08d}.pdf", args.db), args.repeat)
+    _time('first page', lambda: database.list_results({}, 50, None, args.db), args.repeat)
+    _time('first page, status=PARTIAL', lambda: database.list_results({'status': 'PARTIAL'}, 50, None, args.db),
+          args.repeat)
+    _time('first page, verified', lambda: database.list_results({'verified': True}, 50, None, args.db), args.repeat)
+    _, cursor = database.list_results({'processing_tier': 'LLM'}, 50, args.rows // 10, args.db)
+    _time('deep page, processing_tier=LLM', lambda: database.list_results(
+        {'processing_tier': 'LLM'}, 50, cursor, args.db), args.repeat)
+    plan = database.get_connection(args.db).execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM invoices WHERE status = ? AND id < ? ORDER BY id DESC LIMIT 51",
+        ('PARTIAL', args.rows)).fetchall()
+    print('plan (status filter):', '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
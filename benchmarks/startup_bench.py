@@ -0,0 +1,63 @@
+"""Cold-start import report for the web app and batch CLI, built on `python -X importtime`.
+
+    python -m benchmarks.startup_bench [--top 10] [--max-ms 500]
+
+Exits non-zero when a heavy model/OCR dependency is imported at startup or an entry point takes
+longer than --max-ms to import, so it can guard against import-time regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ENTRY_POINTS = ['app', 'batch_process_invoices', 'core.pipeline']
+# Only the tier that needs them may import these
+HEAVY_MODULES = ['transformers', 'torch', 'doctr', 'requests', 'PyPDF2', 'PIL', 'pytesseract', 'pypdfium2',
+                 'numpy', 'dateutil']
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str):
+    """[(name, self_us, cumulative_us, depth)] for one cold `import module`"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((name.strip(), int(self_us), int(cum_us), (len(name) - len(name.lstrip())) // 2))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level packages to list')
+    parser.add_argument('--max-ms', type=float, default=500.0, help='Import budget per entry point')
+    args = parser.parse_args()
+    failed = False
+    for module in ENTRY_POINTS:
+        rows = import_times(module)
+        end = next(i for i, (name, _, _, depth) in enumerate(rows) if name == module and depth == 0)
+        start = end
+        while start > 0 and rows[start - 1][3] > 0:
+            start -= 1
+        total_ms = rows[end][2] / 1000
+        loaded = {name.split('.')[0] for name, _, _, _ in rows}
+        heavy = [m for m in HEAVY_MODULES if m in loaded]
+        over = total_ms > args.max_ms
+        failed = failed or over or bool(heavy)
+        print(f"\nimport {module}: {total_ms:.1f} ms{'  (over budget)' if over else ''}")
+        if heavy:
+            print(f"  heavy modules imported at startup: {', '.join(heavy)}")
+        # cumulative time of the modules imported directly by the entry point
+        top = sorted((r for r in rows[start:end] if r[3] == 1), key=lambda r: -r[2])[:args.top]
+        for name, _, cum, _ in top:
+            print(f"  {cum / 1000:>8.1f} ms  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
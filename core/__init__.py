@@ -1 +1,6 @@
-from .pipeline import run_full_pipeline
+def __getattr__(name):
+    # Resolved on first use so importing core does not load the tier pipeline and its model imports
+    if name == 'run_full_pipeline':
+        from .pipeline import run_full_pipeline
+        return run_full_pipeline
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,54 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+
+class CircuitBreaker:
+    """Stops calling a failing dependency. After failure_threshold consecutive failures the circuit
+    opens and calls are refused for cooldown_seconds; then a single probe call is let through
+    (half-open), which closes the circuit on success or reopens it on failure."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = 'closed'  # closed -> open -> half_open -> closed | open
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.short_circuited = 0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[str]:
+        """'closed' for a normal call, 'probe' for the one half-open trial call, or None if the call
+        must not be made"""
+        with self._lock:
+            if self.state == 'closed':
+                return 'closed'
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = 'half_open'
+                return 'probe'
+            self.short_circuited += 1
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                if self.state == 'closed':
+                    self.trips += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'short_circuited': self.short_circuited,
+            }
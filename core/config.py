@@ -4,5 +4,53 @@ from dotenv import load_dotenv
 load_dotenv()
 QA_MODEL = os.environ.get("INVOICE_QA_MODEL", "distilbert-base-cased-distilled-squad")
 LLM_MODEL = os.environ.get("INVOICE_LLM_MODEL", "")
+LLM_API_URL = os.environ.get("LLM_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "4"))  # concurrent LLM requests per process
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))  # on 429/5xx and connection errors
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "20"))  # also the longest Retry-After honored
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "3"))  # consecutive failed calls that open the circuit
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "60"))  # seconds before a probe call is let through
+# Invoice text sent to the LLM is pruned to the header, GSTIN and total lines beyond this many tokens
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", "1500"))
+LLM_CHARS_PER_TOKEN = int(os.environ.get("LLM_CHARS_PER_TOKEN", "4"))  # rough estimate used for the budget
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # compressed responses
+QA_BATCH_SIZE = int(os.environ.get("QA_BATCH_SIZE", "8"))  # question/context pairs per QA forward pass
+QA_QUANTIZE = os.environ.get("QA_QUANTIZE", "none").lower()  # "none" (fp32) or "int8" (dynamic, CPU)
+QA_QUANT_CACHE_DIR = os.environ.get("QA_QUANT_CACHE_DIR", "model_cache")
 ENABLE_TEXT_QA = os.environ.get("ENABLE_TEXT_QA", "false").lower() == "true"  # Disabled by default due to issues
+DOCTR_DET_ARCH = os.environ.get("DOCTR_DET_ARCH", "db_resnet50")
+DOCTR_RECO_ARCH = os.environ.get("DOCTR_RECO_ARCH", "crnn_vgg16_bn")
+DOCTR_BATCH_SIZE = int(os.environ.get("DOCTR_BATCH_SIZE", "8"))  # pages per DocTR forward pass
+PDF_OCR_DPI = int(os.environ.get("PDF_OCR_DPI", "200"))
+PDF_OCR_MAX_PAGES = int(os.environ.get("PDF_OCR_MAX_PAGES", "10"))
+PDF_OCR_MIN_CHARS = int(os.environ.get("PDF_OCR_MIN_CHARS", "50"))  # pages with a thinner text layer get OCR'd
+TEXT_EXTRACT_EDGE_PAGES = int(os.environ.get("TEXT_EXTRACT_EDGE_PAGES", "0"))  # >0 reads only the first/last N pages
+TEXT_EXTRACT_STOP_ON_TOTALS = os.environ.get("TEXT_EXTRACT_STOP_ON_TOTALS", "false").lower() == "true"
+CONTENT_STORE_DIR = os.environ.get("CONTENT_STORE_DIR", os.path.join("uploads", "objects"))  # uploads by SHA-256
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "ocr_cache")
+OCR_CACHE_MEMORY_BYTES = int(os.environ.get("OCR_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+OCR_CACHE_DISK_BYTES = int(os.environ.get("OCR_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Wall-clock seconds per invoice; expensive tiers are not started once it is spent (0 = no budget)
+INVOICE_LATENCY_BUDGET_SECONDS = float(os.environ.get("INVOICE_LATENCY_BUDGET_SECONDS", "0"))
+# Invoices whose regex fields match an earlier one (GSTIN, number, date, amount) skip the later tiers
+DUPLICATE_DETECTION = os.environ.get("DUPLICATE_DETECTION", "true").lower() == "true"
+VENDOR_MASTER_REFRESH_SECONDS = float(os.environ.get("VENDOR_MASTER_REFRESH_SECONDS", "60"))  # GSTIN -> vendor map reload
+INVOICE_HISTORY = os.environ.get("INVOICE_HISTORY", "false").lower() == "true"  # keep every tier's output
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL").upper()  # SQLite synchronous mode under WAL
+DB_BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "10"))  # seconds to wait on a locked database
+DB_WRITE_BEHIND = os.environ.get("DB_WRITE_BEHIND", "true").lower() == "true"  # queue invoice upserts
+DB_WRITE_BATCH_MAX = int(os.environ.get("DB_WRITE_BATCH_MAX", "200"))  # rows per write-behind transaction
+DB_WRITE_BATCH_WAIT = float(os.environ.get("DB_WRITE_BATCH_WAIT_MS", "50")) / 1000  # how long a batch collects
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_EXECUTOR = os.environ.get("JOB_EXECUTOR", "thread").lower()  # "thread" or "process"
+DATE_DAYFIRST = os.environ.get("DATE_DAYFIRST", "false").lower() == "true"  # how 03/04/2023 is read
+DATE_CACHE_SIZE = int(os.environ.get("DATE_CACHE_SIZE", "4096"))
+# Models loaded on a background thread at startup ("doctr", "qa"); empty disables preloading
+MODEL_PRELOAD = [m.strip() for m in os.environ.get("MODEL_PRELOAD", "doctr,qa" if ENABLE_TEXT_QA else "doctr").split(',')
+                 if m.strip()]
 GSTIN_REGEX = re.compile(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][A-Z0-9]Z[A-Z0-9]$')
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import shutil
+import threading
+from typing import BinaryIO, Tuple
+from .config import CONTENT_STORE_DIR
+
+def object_path(content_hash: str, ext: str, store_dir: str = CONTENT_STORE_DIR) -> str:
+    return os.path.join(store_dir, content_hash[:2], f"{content_hash}{ext}")
+
+def _link(src: str, dest: str):
+    """Point dest at src (hard link, or a copy where links are not possible), replacing dest atomically"""
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+def store_upload(stream: BinaryIO, filename: str, upload_dir: str, store_dir: str = CONTENT_STORE_DIR,
+                 chunk_size: int = 1024 * 1024) -> Tuple[str, str]:
+    """Stream an upload to disk while hashing it. The bytes are kept once under
+    store_dir/<hash[:2]>/<hash><ext>, and upload_dir/filename links to that object.
+    Returns (upload path, sha256 hex digest)."""
+    ext = os.path.splitext(filename)[1].lower()
+    os.makedirs(store_dir, exist_ok=True)
+    tmp = os.path.join(store_dir, f"incoming.{os.getpid()}.{threading.get_ident()}.tmp")
+    h = hashlib.sha256()
+    try:
+        with open(tmp, 'wb') as out:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                h.update(chunk)
+                out.write(chunk)
+        content_hash = h.hexdigest()
+        obj = object_path(content_hash, ext, store_dir)
+        if os.path.exists(obj):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            os.replace(tmp, obj)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    path = os.path.join(upload_dir, filename)
+    _link(obj, path)
+    return path, content_hash
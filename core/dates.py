@@ -0,0 +1,80 @@
+import re
+import time
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+from .config import DATE_DAYFIRST, DATE_CACHE_SIZE
+
+_MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3, 'apr': 4, 'april': 4,
+    'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7, 'aug': 8, 'august': 8, 'sep': 9, 'sept': 9,
+    'september': 9, 'oct': 10, 'october': 10, 'nov': 11, 'november': 11, 'dec': 12, 'december': 12,
+}
+_PARTIAL_ISO_RE = re.compile(r'20\d{2}-\d{2}')
+_ISO_RE = re.compile(r'([1-9]\d{3})-(\d{1,2})-(\d{1,2})')
+# 12-Mar-24, 12/Mar/2024, 12 March 2024
+_DAY_MONTH_NAME_RE = re.compile(r'(\d{1,2})([-/ ])([A-Za-z]{3,9})\2(\d{2}|[1-9]\d{3})')
+# March 5, 2024 / Mar 5 2024
+_MONTH_NAME_DAY_RE = re.compile(r'([A-Za-z]{3,9}) (\d{1,2}),? ([1-9]\d{3})')
+# 03/04/2023, 15.01.2024, 31-12-2021 (four-digit year only; two-digit years are left to dateutil)
+_NUMERIC_RE = re.compile(r'(\d{1,2})([-/.])(\d{1,2})\2([1-9]\d{3})')
+
+def _full_year(year: str) -> int:
+    """Two-digit years resolve like dateutil: to the year within 50 years of the current one"""
+    y = int(year)
+    if len(year) > 2:
+        return y
+    current = time.localtime().tm_year
+    y += current // 100 * 100
+    if y >= current + 50:
+        y -= 100
+    elif y < current - 50:
+        y += 100
+    return y
+
+def _iso(year: int, month: int, day: int) -> Optional[str]:
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+def _numeric(a: int, b: int, year: int, dayfirst: bool) -> Optional[str]:
+    """a/b/year with the configured day-first or month-first policy; a field above 12 can only be
+    the day, which overrides the policy"""
+    if dayfirst:
+        day, month = (a, b) if b <= 12 or a > 12 else (b, a)
+    else:
+        month, day = (a, b) if a <= 12 or b > 12 else (b, a)
+    return _iso(year, month, day)
+
+def _fast_parse(s: str, dayfirst: bool) -> Optional[str]:
+    """ISO date for the formats the extractors produce; None leaves the string to dateutil"""
+    m = _ISO_RE.fullmatch(s)
+    if m:
+        return _iso(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    m = _DAY_MONTH_NAME_RE.fullmatch(s)
+    if m and m.group(3).lower() in _MONTHS:
+        return _iso(_full_year(m.group(4)), _MONTHS[m.group(3).lower()], int(m.group(1)))
+    m = _MONTH_NAME_DAY_RE.fullmatch(s)
+    if m and m.group(1).lower() in _MONTHS:
+        return _iso(int(m.group(3)), _MONTHS[m.group(1).lower()], int(m.group(2)))
+    m = _NUMERIC_RE.fullmatch(s)
+    if m:
+        return _numeric(int(m.group(1)), int(m.group(3)), int(m.group(4)), dayfirst)
+    return None
+
+def parse_with_dateutil(s: str, dayfirst: bool = DATE_DAYFIRST) -> Optional[str]:
+    from dateutil.parser import parse
+    try:
+        return parse(s, fuzzy=True, dayfirst=dayfirst).date().isoformat()
+    except Exception:
+        return None
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def normalize_date(s: str, dayfirst: bool = DATE_DAYFIRST) -> Optional[str]:
+    """ISO date for a raw date string, or None. Common invoice formats are parsed with precompiled
+    patterns; anything else goes through dateutil's fuzzy parser."""
+    s = s.strip()
+    if not s or _PARTIAL_ISO_RE.fullmatch(s):
+        return None
+    return _fast_parse(s, dayfirst) or parse_with_dateutil(s, dayfirst)
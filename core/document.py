@@ -0,0 +1,87 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import List, Optional, Sequence
+
+_SUMMARY_RE = re.compile(r'(?i)^\s*(?:total|subtotal|amount chargeable|balance due)', re.MULTILINE)
+
+def keyword_view(text: str) -> Optional[str]:
+    """text.lower(), when str.find on it agrees with re.IGNORECASE matching of ASCII keywords at the
+    same offsets. That holds unless the text contains a dotted or dotless I (U+0130/U+0131) or a
+    long s (U+017F), which the regex engine folds onto ASCII letters but str.lower() does not."""
+    if '\u0130' in text or '\u0131' in text or '\u017f' in text:
+        return None
+    low = text.lower()
+    return low if len(low) == len(text) else None
+
+def find_all(haystack: str, needle: str) -> List[int]:
+    positions = []
+    i = haystack.find(needle)
+    while i != -1:
+        positions.append(i)
+        i = haystack.find(needle, i + len(needle))
+    return positions
+
+class ParsedDocument:
+    """An invoice text split into lines once, with the line offsets, stripped and lowercased views
+    and the header/summary boundary shared by the extractors."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines: List[str] = text.splitlines()
+        self.line_starts: List[int] = []
+        offset = 0
+        for ln in text.splitlines(keepends=True):
+            self.line_starts.append(offset)
+            offset += len(ln)
+        m = _SUMMARY_RE.search(text)
+        # The summary starts at a line start, so the header is exactly the lines before it
+        self.summary_start = m.start() if m else None
+        if m:
+            self.header_text = text[:m.start()]
+            self.summary_text = text[m.start():]
+            self.header_line_count = bisect_left(self.line_starts, m.start())
+        else:
+            self.header_text = self.summary_text = text
+            self.header_line_count = len(self.lines)
+
+    @cached_property
+    def stripped(self) -> List[str]:
+        return [ln.strip() for ln in self.lines]
+
+    @cached_property
+    def lower_lines(self) -> List[str]:
+        return [ln.lower() for ln in self.lines]
+
+    @cached_property
+    def low_text(self) -> Optional[str]:
+        return keyword_view(self.text)
+
+    @cached_property
+    def header_lines(self) -> List[str]:
+        """Non-empty stripped header lines"""
+        return [ln for ln in self.stripped[:self.header_line_count] if ln]
+
+    def line_index(self, pos: int) -> int:
+        return bisect_right(self.line_starts, pos) - 1
+
+    def find_all(self, keyword: str) -> List[int]:
+        """Offsets of a lowercase ASCII keyword, matched case-insensitively"""
+        if self.low_text is not None:
+            return find_all(self.low_text, keyword)
+        return [m.start() for m in re.finditer(re.escape(keyword), self.text, re.IGNORECASE)]
+
+    def lines_with(self, keywords: Sequence[str]) -> List[int]:
+        """Indices (ascending) of lines whose lowercase form contains any of the keywords"""
+        if self.low_text is None:
+            return [i for i, low in enumerate(self.lower_lines) if any(k in low for k in keywords)]
+        found = set()
+        for kw in keywords:
+            i = self.low_text.find(kw)
+            while i != -1:
+                idx = self.line_index(i)
+                found.add(idx)
+                # skip the rest of this line
+                end = self.line_starts[idx + 1] if idx + 1 < len(self.line_starts) else len(self.text)
+                i = self.low_text.find(kw, max(end, i + 1))
+        return sorted(found)
@@ -0,0 +1,20 @@
+import re
+from typing import Dict, Any, Optional
+
+_NON_ALNUM_RE = re.compile(r'[^A-Z0-9]')
+
+def duplicate_key(data: Dict[str, Any]) -> Optional[str]:
+    """Normalized GSTIN|invoice number|ISO date|amount rounded to the rupee, or None unless all four
+    are known. Rescans and photos of the same invoice produce the same key; punctuation and case in
+    the invoice number and paise in the total are ignored."""
+    gstin = _NON_ALNUM_RE.sub('', str(data.get('vendor_gstin') or '').upper())
+    number = _NON_ALNUM_RE.sub('', str(data.get('invoice_number') or '').upper())
+    date = data.get('invoice_date')
+    amount = data.get('total_amount')
+    if len(gstin) != 15 or not number or not date:
+        return None
+    try:
+        bucket = round(float(amount))
+    except (TypeError, ValueError):
+        return None
+    return f"{gstin}|{number}|{date}|{bucket}"
@@ -0,0 +1,104 @@
+import os
+import re
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from .config import TEXT_EXTRACT_EDGE_PAGES, TEXT_EXTRACT_STOP_ON_TOTALS
+from .utils import file_sha256
+
+SUPPORTED_EXTS = ('.pdf', '.png', '.jpg', '.jpeg')
+# Bump when extraction output changes so persisted text layers are not reused
+EXTRACTOR_VERSION = f"1:edge={TEXT_EXTRACT_EDGE_PAGES}:stop={int(TEXT_EXTRACT_STOP_ON_TOTALS)}"
+_HEADER_SEEN_RE = re.compile(r'Invoice\s*(?:No|#|Number|Code)|\b\d{2}[A-Z]{5}\d{4}[A-Z][A-Z0-9]Z[A-Z0-9]\b', re.IGNORECASE)
+_TOTALS_SEEN_RE = re.compile(r'^\s*(?:grand\s+total|total\s*amount|amount\s+chargeable|balance\s+due)', re.IGNORECASE | re.MULTILINE)
+
+def _page_order(page_count: int, edge_pages: int) -> List[int]:
+    if edge_pages <= 0 or page_count <= 2 * edge_pages:
+        return list(range(page_count))
+    return list(range(edge_pages)) + list(range(page_count - edge_pages, page_count))
+
+def iter_page_texts(path: str, edge_pages: int = TEXT_EXTRACT_EDGE_PAGES) -> Iterator[Dict[str, Any]]:
+    """Yield {'page', 'page_count', 'text', 'chars', 'seconds'} per page of a PDF or image.
+    When edge_pages > 0, PDFs longer than 2 * edge_pages only have their first and last
+    edge_pages pages read. Raises ValueError for unsupported file types."""
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        import PyPDF2
+        with open(path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            page_count = len(reader.pages)
+            for index in _page_order(page_count, edge_pages):
+                t0 = time.perf_counter()
+                try:
+                    page_text = reader.pages[index].extract_text() or ''
+                except Exception:
+                    page_text = ''
+                yield {'page': index, 'page_count': page_count, 'text': page_text,
+                       'chars': len(page_text), 'seconds': time.perf_counter() - t0}
+    elif lower.endswith(('.png', '.jpg', '.jpeg')):
+        import pytesseract
+        from PIL import Image
+        t0 = time.perf_counter()
+        page_text = pytesseract.image_to_string(Image.open(path))
+        yield {'page': 0, 'page_count': 1, 'text': page_text,
+               'chars': len(page_text), 'seconds': time.perf_counter() - t0}
+    else:
+        raise ValueError(f"Unsupported file type: {os.path.splitext(path)[1] or path}")
+
+def extract_text(path: str, edge_pages: int = TEXT_EXTRACT_EDGE_PAGES,
+                 stop_when_complete: bool = TEXT_EXTRACT_STOP_ON_TOTALS) -> Tuple[str, Dict[str, Any]]:
+    """Return (text, stats) for a document. With stop_when_complete, reading stops at the first
+    page by which both header fields (invoice number or GSTIN) and a totals line have been seen."""
+    parts: List[str] = []
+    pages: List[Dict[str, Any]] = []
+    page_count = 0
+    header_seen = totals_seen = False
+    t0 = time.perf_counter()
+    page_iter = iter_page_texts(path, edge_pages)
+    try:
+        for page in page_iter:
+            page_count = page['page_count']
+            parts.append(page['text'])
+            pages.append({'page': page['page'], 'chars': page['chars'], 'seconds': page['seconds']})
+            if stop_when_complete:
+                header_seen = header_seen or bool(_HEADER_SEEN_RE.search(page['text']))
+                totals_seen = totals_seen or bool(_TOTALS_SEEN_RE.search(page['text']))
+                if header_seen and totals_seen:
+                    break
+    finally:
+        page_iter.close()
+    stats = {
+        'page_count': page_count,
+        'pages_read': len(pages),
+        'skipped_pages': page_count - len(pages),
+        'pages': pages,
+        'seconds': time.perf_counter() - t0,
+    }
+    return ''.join(parts), stats
+
+def extractor_name(path: str) -> str:
+    return 'pdf_text' if path.lower().endswith('.pdf') else 'tesseract'
+
+def get_or_extract_text(path: str, content_hash: Optional[str] = None) -> str:
+    """Return the document's text layer, loading it from the database when this content was
+    extracted before and extracting (then persisting) it otherwise."""
+    from database import load_document_text, save_document_text
+    if not path.lower().endswith(SUPPORTED_EXTS):
+        raise ValueError(f"Unsupported file type: {os.path.splitext(path)[1] or path}")
+    content_hash = content_hash or file_sha256(path)
+    extractor = extractor_name(path)
+    try:
+        text = load_document_text(content_hash, extractor, EXTRACTOR_VERSION)
+    except Exception as e:
+        print(f"Could not load stored text for {path}: {e}")
+        text = None
+    if text is not None:
+        return text
+    text, stats = extract_text(path)
+    skipped = f", {stats['skipped_pages']} skipped" if stats['skipped_pages'] else ""
+    print(f"Extracted text from {path}: {stats['pages_read']}/{stats['page_count']} pages{skipped}, "
+          f"{len(text)} chars in {stats['seconds']:.2f}s")
+    try:
+        save_document_text(content_hash, extractor, EXTRACTOR_VERSION, text)
+    except Exception as e:
+        print(f"Could not store extracted text for {path}: {e}")
+    return text
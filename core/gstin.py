@@ -1,31 +1,53 @@
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .config import GSTIN_REGEX
+from .document import ParsedDocument
+from .keywords import CATEGORIES, keyword_hits, keyword_set
 from .utils import is_company_like_line
 
-def _linewise(text: str):
-    lines = text.splitlines()
-    return list(enumerate(lines))
+_GSTIN_TOKEN_RE = re.compile(r'\b(\d{2}[A-Z]{5}\d{4}[A-Z][A-Z0-9]Z[A-Z0-9])\b', re.IGNORECASE)
+_GSTIN_Z_OFFSET = 13
+_VENDOR_LINE_REJECT = keyword_set('invoice', 'gstin', 'date', 'tax invoice', 'bill to', 'buyer', 'consignee', 'ship to',
+                                  'address', 'store')
+_VENDOR_SUFFIXES = keyword_set('private limited', 'pvt ltd', 'pvt. ltd.', 'ltd', 'llp', 'inc', 'company', 'limited')
 
-def _has_any(s: str, keywords: List[str]) -> bool:
-    low = s.lower()
-    return any(k in low for k in keywords)
+def _gstin_matches(text: str) -> List[re.Match]:
+    """Same matches as _GSTIN_TOKEN_RE.finditer(text), but only tries the offsets where the fixed
+    'Z' (14th character) lines up, found with str.find instead of a regex scan of every character"""
+    starts = []
+    for z in ('Z', 'z'):
+        pos = text.find(z, _GSTIN_Z_OFFSET)
+        while pos != -1:
+            starts.append(pos - _GSTIN_Z_OFFSET)
+            pos = text.find(z, pos + 1)
+    starts.sort()
+    matches = []
+    for start in starts:
+        m = _GSTIN_TOKEN_RE.match(text, start)
+        if m:
+            matches.append(m)
+    return matches
 
-def extract_gstin_roles_and_vendor(text: str, header_text: str) -> Dict[str, Any]:
-    lines = _linewise(text)
-    header_lines = set(i for i, _ in _linewise(header_text))
+def extract_gstin_roles_and_vendor(text: str, header_text: str, doc: Optional[ParsedDocument] = None) -> Dict[str, Any]:
+    if doc is None:
+        doc = ParsedDocument(text)
+        header_line_count = len(header_text.splitlines())
+    else:
+        header_line_count = doc.header_line_count
+    lines = doc.lines
     results = []
-    pat = re.compile(r'\b(\d{2}[A-Z]{5}\d{4}[A-Z][A-Z0-9]Z[A-Z0-9])\b', re.IGNORECASE)
-    for idx, line in lines:
-        for m in pat.finditer(line):
-            val = m.group(1).strip().upper()
-            role = None
-            neighborhood = ' '.join([lines[i][1] for i in range(max(0, idx-2), min(len(lines), idx+3))])
-            if _has_any(neighborhood, ['customer', 'buyer', 'bill to', 'billed to', 'consignee', 'ship to']):
-                role = 'customer'
-            if _has_any(neighborhood, ['supplier', 'vendor', 'seller', 'from']):
-                role = 'vendor'
-            results.append({'value': val, 'line_idx': idx, 'role_hint': role, 'in_header': idx in header_lines})
+    # GSTINs cannot span a line break, so one scan over the whole text finds the same matches
+    # as scanning line by line; the line index is recovered from the match offset.
+    for m in _gstin_matches(text):
+        idx = doc.line_index(m.start())
+        val = m.group(1).strip().upper()
+        role = None
+        hits = keyword_hits(' '.join(doc.lower_lines[max(0, idx-2):idx+3]))
+        if hits & CATEGORIES['party_customer']:
+            role = 'customer'
+        if hits & CATEGORIES['party_vendor']:
+            role = 'vendor'
+        results.append({'value': val, 'line_idx': idx, 'role_hint': role, 'in_header': idx < header_line_count})
     seen = set()
     dedup = []
     for r in results:
@@ -55,12 +77,11 @@ def extract_gstin_roles_and_vendor(text: str, header_text: str) -> Dict[str, Any
                 customer_gstin = r
                 break
     vendor_name_hint = None
-    def good_vendor_line(s: str) -> bool:
-        s = s.strip()
+    def good_vendor_line(j: int) -> bool:
+        s = doc.stripped[j]
         if not s or len(s) < 3:
             return False
-        low = s.lower()
-        if _has_any(low, ['invoice', 'gstin', 'date', 'tax invoice', 'bill to', 'buyer', 'consignee', 'ship to', 'address', 'store']):
+        if keyword_hits(doc.lower_lines[j].strip()) & _VENDOR_LINE_REJECT:
             return False
         if re.fullmatch(r'[\d/ .-]+', s):
             return False
@@ -71,30 +92,25 @@ def extract_gstin_roles_and_vendor(text: str, header_text: str) -> Dict[str, Any
         vi = vendor_gstin['line_idx']
         window_up = range(max(0, vi-10), vi)
         window_down = range(vi+1, min(len(lines), vi+4))
-        suffixes = ['private limited','pvt ltd','pvt. ltd.','ltd','llp','inc','company','limited']
         best = None
-        for j in reversed(list(window_up)):
-            candidate = lines[j][1].strip()
-            if good_vendor_line(candidate) and any(sf in candidate.lower() for sf in suffixes):
-                best = candidate
+        for j in reversed(window_up):
+            if good_vendor_line(j) and keyword_hits(doc.lower_lines[j].strip()) & _VENDOR_SUFFIXES:
+                best = doc.stripped[j]
                 break
         if not best:
             for j in window_down:
-                candidate = lines[j][1].strip()
-                if good_vendor_line(candidate) and any(sf in candidate.lower() for sf in suffixes):
-                    best = candidate
+                if good_vendor_line(j) and keyword_hits(doc.lower_lines[j].strip()) & _VENDOR_SUFFIXES:
+                    best = doc.stripped[j]
                     break
         if not best:
-            for j in reversed(list(window_up)):
-                candidate = lines[j][1].strip()
-                if good_vendor_line(candidate):
-                    best = candidate
+            for j in reversed(window_up):
+                if good_vendor_line(j):
+                    best = doc.stripped[j]
                     break
         if not best:
             for j in window_down:
-                candidate = lines[j][1].strip()
-                if good_vendor_line(candidate):
-                    best = candidate
+                if good_vendor_line(j):
+                    best = doc.stripped[j]
                     break
         if best:
             vendor_name_hint = best[:120]
@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from .config import JOB_WORKERS, JOB_EXECUTOR, DOCTR_BATCH_SIZE
+from .extract import get_or_extract_text
+from .utils import file_sha256
+from database import create_job, get_job, update_job_state, record_job_tier, flush_writes, WriteBehindError
+
+def run_jobs(jobs: List[Tuple[str, str, Optional[str]]]):
+    """Extract text and run the tier pipeline for a group of (job_id, file_path, content_hash) jobs,
+    recording their state as it goes. content_hash is the file's SHA-256 if known, else None. In a group of several, documents that will need DocTR are OCR'd together
+    in one batched call first, so the pipeline finds them in the OCR cache, and those reaching Text_QA
+    share one batched QA call. Module-level so it can run in a process pool."""
+    from .pipeline import run_pipelines, regex_tier
+    from .ocr_cache import cached_process_with_doctr_batch
+    texts: Dict[str, str] = {}
+    hashes: Dict[str, str] = {}
+    regex: Dict[str, tuple] = {}
+    # seconds charged to each job's latency budget: its own extraction and regex pass, and its share
+    # of the batched DocTR call, but not the time spent waiting on the other jobs in the group
+    spent: Dict[str, float] = {}
+    for job_id, file_path, content_hash in jobs:
+        update_job_state(job_id, 'running')
+        t0 = time.monotonic()
+        try:
+            hashes[job_id] = content_hash or file_sha256(file_path)
+            texts[job_id] = get_or_extract_text(file_path, hashes[job_id])
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            update_job_state(job_id, 'failed', error=str(e))
+        spent[job_id] = time.monotonic() - t0
+    if len(jobs) > 1:
+        # the RegexOnly result decides who needs DocTR, and the pipeline reuses it
+        for job_id, text in texts.items():
+            t0 = time.monotonic()
+            regex[job_id] = regex_tier(text)
+            spent[job_id] += time.monotonic() - t0
+    ocr_jobs = [(job_id, file_path) for job_id, file_path, _ in jobs if job_id in regex and not regex[job_id][1]]
+    if len(ocr_jobs) > 1:
+        t0 = time.monotonic()
+        try:
+            cached_process_with_doctr_batch([file_path for _, file_path in ocr_jobs],
+                                            content_hashes=[hashes[job_id] for job_id, _ in ocr_jobs])
+        except Exception as e:
+            print(f"Batched DocTR failed, falling back to per-document OCR: {e}")
+        share = (time.monotonic() - t0) / len(ocr_jobs)
+        for job_id, _ in ocr_jobs:
+            spent[job_id] += share
+    runnable = [(job_id, file_path) for job_id, file_path, _ in jobs if job_id in texts]
+    # documents reaching Text_QA are answered together in one batched call
+    outcomes = run_pipelines([{'image_path': file_path, 'text_content': texts[job_id],
+                               'progress': lambda tier, event, job_id=job_id: record_job_tier(job_id, tier, event),
+                               'content_hash': hashes[job_id], 'regex_result': regex.get(job_id),
+                               'spent': spent[job_id]} for job_id, file_path in runnable])
+    # the results must be readable once the jobs report done, and a job whose result could not be
+    # saved has failed
+    unsaved: Dict[str, str] = {}
+    try:
+        flush_writes()
+    except WriteBehindError as e:
+        unsaved = e.failures
+    for (job_id, file_path), outcome in zip(runnable, outcomes):
+        error = str(outcome['error']) if outcome['error'] is not None else unsaved.get(file_path)
+        if error is not None:
+            print(f"Job {job_id} failed: {error}")
+            update_job_state(job_id, 'failed', error=error)
+        else:
+            update_job_state(job_id, 'done')
+
+def _fail_unfinished(job_id: str, error: Exception):
+    """Mark a job failed after its group crashed, unless it already finished (done or failed)"""
+    try:
+        job = get_job(job_id)
+        if job and job['state'] in ('done', 'failed'):
+            return
+        print(f"Job {job_id} crashed: {error}")
+        update_job_state(job_id, 'failed', error=str(error))
+    except Exception as e:
+        print(f"Could not record crash of job {job_id}: {e}")
+
+def run_job(job_id: str, file_path: str, content_hash: Optional[str] = None):
+    run_jobs([(job_id, file_path, content_hash)])
+
+class JobQueue:
+    """Bounded pool of workers that run submitted files through the pipeline off the request thread."""
+
+    def __init__(self, workers: int = JOB_WORKERS, executor: str = JOB_EXECUTOR, batch_size: int = DOCTR_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._process_pool = None
+        if executor == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+            self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"invoice-job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, file_path: str, content_hash: Optional[str] = None) -> str:
+        """Queue a file. content_hash is its SHA-256 if the caller already computed it (store_upload
+        does), so the job does not read the file again to key its caches."""
+        job_id = uuid.uuid4().hex
+        create_job(job_id, file_path)
+        self._pending.put((job_id, file_path, content_hash))
+        return job_id
+
+    def pending(self) -> int:
+        return self._pending.qsize()
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, str, Optional[str]]], bool]:
+        """Block for one job, then take whatever else is already waiting (up to the DocTR batch size)."""
+        item = self._pending.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        stop = False
+        while len(batch) < self.batch_size:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _worker(self):
+        while True:
+            batch, stop = self._next_batch()
+            try:
+                if batch and self._process_pool is not None:
+                    self._process_pool.submit(run_jobs, batch).result()
+                elif batch:
+                    run_jobs(batch)
+            except Exception as e:
+                for job_id, _, _ in batch:
+                    _fail_unfinished(job_id, e)
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._pending.task_done()
+            if stop:
+                return
+
+    def shutdown(self, wait: bool = True):
+        for _ in self._threads:
+            self._pending.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
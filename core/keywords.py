@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable
+
+# Keyword categories shared by the vendor/line heuristics; keywords are lowercase substrings
+CATEGORIES: Dict[str, FrozenSet[str]] = {
+    'invoice_label': frozenset([
+        'invoice', 'invoice no', 'invoice code', 'tax invoice', 'gstin', 'order no', 'ref.', 'ref ', 'ref:',
+        'date', 'dated', 'prepared by', 'party :', 'party:', 'amount', 'address']),
+    'address': frozenset([
+        'road', 'rd', 'street', 'st ', 'st.', 'lane', 'ln', 'complex', 'tower', 'floor', 'opp', 'near', 'shop',
+        'block', 'sector', 'phase', 'plot', 'no.', 'no ']),
+    'locality': frozenset([
+        'colony', 'market', 'apartment', 'residency', 'residence', 'society', 'village', 'taluka', 'tehsil',
+        'district', 'dist', 'po ', 'ps ', 'pin', 'pincode', 'zip', 'city', 'state']),
+    'contact': frozenset([
+        'contact', 'phone', 'mobile', 'email', 'www', 'website', 'store', 'helpline', 'care', 'customer']),
+    'company_suffix': frozenset([
+        'private limited', 'pvt', 'pvt.', 'pvt ltd', 'pvt. ltd.', 'ltd', 'llp', 'inc', 'co', 'company', 'limited']),
+    'party_customer': frozenset(['customer', 'buyer', 'bill to', 'billed to', 'consignee', 'ship to']),
+    'party_vendor': frozenset(['supplier', 'vendor', 'seller', 'from']),
+    'amount_words': frozenset(['inr', 'thousand', 'hundred', 'only']),
+}
+
+class KeywordMatcher:
+    """Finds every keyword occurring in a lowercase string, overlapping ones included, with a single
+    compiled alternation instead of one substring test per keyword."""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = {name: frozenset(words) for name, words in categories.items()}
+        self.keywords = frozenset(w for words in self.categories.values() for w in words)
+        # Longest first, so each search reports the longest keyword starting at its position;
+        # the shorter keywords starting there are its prefixes and are added back from _prefixes.
+        ordered = sorted(self.keywords, key=lambda w: (-len(w), w))
+        self._pattern = re.compile('|'.join(re.escape(w) for w in ordered))
+        self._prefixes = {w: frozenset(p for p in self.keywords if w.startswith(p)) for w in self.keywords}
+
+    def keywords_in(self, low: str) -> FrozenSet[str]:
+        found = set()
+        search = self._pattern.search
+        m = search(low)
+        while m:
+            found |= self._prefixes[m.group()]
+            # restart one character later so keywords overlapping this one are found too
+            m = search(low, m.start() + 1)
+        return frozenset(found)
+
+_matcher = KeywordMatcher(CATEGORIES)
+
+def keyword_set(*words: str) -> FrozenSet[str]:
+    """Frozen set of keywords for a heuristic; every keyword must be known to the shared matcher."""
+    unknown = set(words) - _matcher.keywords
+    if unknown:
+        raise ValueError(f"Keywords missing from CATEGORIES: {sorted(unknown)}")
+    return frozenset(words)
+
+@lru_cache(maxsize=4096)
+def keyword_hits(low: str) -> FrozenSet[str]:
+    """All known keywords contained in the lowercase string (cached: the same lines are checked by
+    several heuristics and tiers)"""
+    return _matcher.keywords_in(low)
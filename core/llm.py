@@ -1,49 +1,76 @@
 import json
 import os
 from typing import Dict, Any
-import requests
-from .config import LLM_MODEL
+from .config import LLM_MODEL, LLM_CACHE_ENABLED
+from .llm_client import get_llm_client
+from .llm_cache import get_llm_cache
+from .prompt import build_llm_context
 from .utils import parse_date_str, clean_amount, normalize_invoice_number
 
+# Bump LLM_PROMPT_VERSION whenever SYSTEM_PROMPT or the user prompt layout changes so cached
+# responses to the old prompt are no longer used
+LLM_PROMPT_VERSION = "2"
+SYSTEM_PROMPT = (
+    "You extract structured invoice fields. Return STRICT minified JSON with keys: "
+    "vendor_name, invoice_number, invoice_date (ISO yyyy-mm-dd), total_amount (number), "
+    "vendor_gstin, customer_gstin. Missing values use null. No extra text.")
+
+def _parse_content(content: str) -> Dict[str, Any]:
+    i, j = content.find('{'), content.rfind('}')
+    if i == -1 or j == -1:
+        return {}
+    parsed = json.loads(content[i:j+1])
+    if parsed.get('invoice_date'):
+        parsed['invoice_date'] = parse_date_str(parsed['invoice_date']) or parsed['invoice_date']
+    if parsed.get('total_amount') is not None:
+        parsed['total_amount'] = clean_amount(parsed['total_amount'])
+    if parsed.get('invoice_number'):
+        parsed['invoice_number'] = normalize_invoice_number(parsed.get('invoice_number'))
+    parsed['processing_tier'] = 'LLM'
+    return parsed
+
 def process_with_llm(text: str) -> Dict[str, Any]:
+    """LLM-tier extraction on a relevance-pruned copy of the text (see build_llm_context). Responses
+    are cached by model, prompt version and that text; the result's llm_cache field says whether this
+    one was served from the cache ('hit'), the API ('miss') or the API with the cache off ('disabled'),
+    llm_chars_saved how much pruning cut. Both are stored with the invoice and its tier history."""
     api_key = os.environ.get("GROQ_API_KEY")
     if not api_key or not text.strip():
         return {}
     model = LLM_MODEL or "mixtral-8x7b-32768"
     try:
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        system_prompt = (
-            "You extract structured invoice fields. Return STRICT minified JSON with keys: "
-            "vendor_name, invoice_number, invoice_date (ISO yyyy-mm-dd), total_amount (number), "
-            "vendor_gstin, customer_gstin. Missing values use null. No extra text.")
-        user_prompt = f"Invoice Text:\n{text[:15000]}"
+        invoice_text, prompt_info = build_llm_context(text)
+        if prompt_info['chars_saved']:
+            print(f"LLM prompt pruned to {prompt_info['chars_sent']} of {prompt_info['chars_in']} chars")
+        cache = get_llm_cache() if LLM_CACHE_ENABLED else None
+        key = cache.key_for(model, LLM_PROMPT_VERSION, invoice_text) if cache else None
+        content = cache.get(key) if cache else None
+        if content is not None:
+            parsed = _parse_content(content)
+            if parsed:
+                parsed['llm_cache'] = 'hit'
+                parsed['llm_chars_saved'] = prompt_info['chars_saved']
+                return parsed
         payload = {
             "model": model,
             "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Invoice Text:\n{invoice_text}"}
             ],
             "temperature": 0
         }
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        resp = requests.post(url, json=payload, headers=headers, timeout=60)
-        if resp.status_code != 200:
+        data = get_llm_client().chat_completion(payload, api_key)
+        if not data:
             return {}
-        data = resp.json()
         content = (data.get('choices') or [{}])[0].get('message', {}).get('content', '')
         if not content:
             return {}
-        i, j = content.find('{'), content.rfind('}')
-        if i == -1 or j == -1:
-            return {}
-        parsed = json.loads(content[i:j+1])
-        if parsed.get('invoice_date'):
-            parsed['invoice_date'] = parse_date_str(parsed['invoice_date']) or parsed['invoice_date']
-        if parsed.get('total_amount') is not None:
-            parsed['total_amount'] = clean_amount(parsed['total_amount'])
-        if parsed.get('invoice_number'):
-            parsed['invoice_number'] = normalize_invoice_number(parsed.get('invoice_number'))
-        parsed['processing_tier'] = 'LLM'
+        parsed = _parse_content(content)
+        if parsed and cache:
+            cache.put(key, model, LLM_PROMPT_VERSION, content)
+        if parsed:
+            parsed['llm_cache'] = 'miss' if cache else 'disabled'
+            parsed['llm_chars_saved'] = prompt_info['chars_saved']
         return parsed
     except Exception:
         return {}
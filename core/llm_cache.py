@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+from .config import LLM_CACHE_ENABLED, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES
+from database import load_llm_response, save_llm_response
+
+class LLMResponseCache:
+    """Durable cache of LLM response content in the llm_cache table. Calls run at temperature 0, so the
+    same model, prompt version and invoice text give the same answer; entries expire after ttl_seconds
+    and the least recently used are evicted once the table exceeds max_bytes."""
+
+    def __init__(self, ttl_seconds: float, max_bytes: int, db_name: str = "invoices.db"):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def key_for(self, model: str, prompt_version: str, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{model}:{prompt_version}:{text_hash}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            content = load_llm_response(key, self.ttl_seconds, self.db_name)
+        except Exception as e:
+            print(f"Could not read LLM cache: {e}")
+            content = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return content
+
+    def put(self, key: str, model: str, prompt_version: str, content: str):
+        try:
+            evicted = save_llm_response(key, model, prompt_version, content, self.max_bytes, self.db_name)
+        except Exception as e:
+            print(f"Could not write LLM cache entry: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': LLM_CACHE_ENABLED,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+_llm_cache = None
+
+def get_llm_cache() -> LLMResponseCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache(LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES)
+    return _llm_cache
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from .circuit import CircuitBreaker
+from .config import (LLM_API_URL, LLM_MAX_IN_FLIGHT, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+                     LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_BREAKER_FAILURES,
+                     LLM_BREAKER_COOLDOWN)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds, given either delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """Chat-completions client with a pooled keep-alive session, a cap on requests in flight, separate
+    connect/read timeouts and jittered retries on 429/5xx and connection errors. A call that still fails
+    after its retries counts against a circuit breaker, which refuses calls outright while the
+    endpoint is down."""
+
+    def __init__(self, url: str = LLM_API_URL, max_in_flight: int = LLM_MAX_IN_FLIGHT,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX, breaker_failures: int = LLM_BREAKER_FAILURES,
+                 breaker_cooldown: float = LLM_BREAKER_COOLDOWN):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._in_flight = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_in_flight))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: uniform over [0, capped exponential]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def chat_completion(self, payload: Dict[str, Any], api_key: str) -> Optional[Dict[str, Any]]:
+        """Response JSON of a successful call, or None once retries are exhausted, the request is
+        rejected or the circuit is open. The in-flight slot is released while backing off."""
+        mode = self.breaker.acquire()
+        if mode is None:
+            print("LLM circuit open, skipping request")
+            return None
+        # a half-open probe gets a single attempt
+        max_retries = 0 if mode == 'probe' else self.max_retries
+        try:
+            data = self._post_with_retries(payload, api_key, max_retries)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if data is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return data or None
+
+    def _post_with_retries(self, payload: Dict[str, Any], api_key: str, max_retries: int) -> Optional[Dict[str, Any]]:
+        """Response JSON, {} if the server answered but rejected the request (it is up, so that does
+        not count against the breaker), or None if it could not be reached"""
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        for attempt in range(max_retries + 1):
+            wait = None
+            with self._in_flight:
+                with self._stats_lock:
+                    self.requests_sent += 1
+                try:
+                    resp = self.session.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+                except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                    print(f"LLM request failed (attempt {attempt + 1}): {e}")
+                    resp = None
+                if resp is not None:
+                    if resp.status_code == 200:
+                        return resp.json()
+                    if resp.status_code not in RETRY_STATUSES:
+                        print(f"LLM request rejected with status {resp.status_code}")
+                        return {}
+                    wait = _retry_after_seconds(resp.headers.get('Retry-After'))
+            if attempt == max_retries:
+                break
+            if wait is not None and wait > self.backoff_max:
+                print(f"LLM server asked to retry after {wait:.0f}s, giving up")
+                break
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(wait if wait is not None else self._backoff(attempt))
+        return None
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
@@ -0,0 +1,75 @@
+import threading
+import time
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterable, Optional
+from .config import MODEL_PRELOAD
+
+class _ModelEntry:
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+        self.model: Any = None
+        self.state = 'idle'  # idle -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+class ModelRegistry:
+    """Loads each registered model at most once at a time. The first caller (or a background preload
+    thread) runs the loader under the entry's lock; everyone else waits on its ready event instead of
+    building a second copy. A failed load is retried by the next caller."""
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        self._entries[name] = _ModelEntry(loader)
+
+    def _load(self, name: str, entry: _ModelEntry):
+        t0 = time.perf_counter()
+        try:
+            model = entry.loader()
+            error = None if model is not None else 'loader returned nothing'
+        except Exception as e:
+            model, error = None, str(e)
+        entry.model = model
+        entry.error = error
+        entry.load_seconds = time.perf_counter() - t0
+        entry.state = 'ready' if model is not None else 'failed'
+        if error:
+            print(f"Loading model {name} failed: {error}")
+        entry.ready.set()
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """The loaded model, loading it in this thread if nobody has started yet. Returns None if
+        loading failed or did not finish within timeout."""
+        entry = self._entries[name]
+        with entry.lock:
+            owner = entry.state in ('idle', 'failed')
+            if owner:
+                entry.state = 'loading'
+                entry.ready.clear()
+        if owner:
+            self._load(name, entry)
+        entry.ready.wait(timeout)
+        return entry.model
+
+    def preload(self, names: Iterable[str]):
+        """Start loading the named models on background daemon threads"""
+        for name in names:
+            if name not in self._entries:
+                print(f"Unknown model to preload: {name}")
+                continue
+            threading.Thread(target=self.get, args=(name,), name=f"preload-{name}", daemon=True).start()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {'state': e.state, 'load_seconds': e.load_seconds, 'error': e.error}
+                for name, e in self._entries.items()}
+
+registry = ModelRegistry()
+# Loaders import their tier module on first use so registering them costs nothing at startup
+registry.register('doctr', lambda: import_module('.ocr', __package__)._load_doctr_predictor())
+registry.register('qa', lambda: import_module('.qa', __package__)._load_qa_pipeline())
+
+def preload_models(names: Iterable[str] = MODEL_PRELOAD):
+    registry.preload(names)
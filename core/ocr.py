@@ -1,42 +1,92 @@
 import os
-from typing import Dict, Any, List
-_doctr_predictor = None
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from .config import (DOCTR_DET_ARCH, DOCTR_RECO_ARCH, DOCTR_BATCH_SIZE,
+                     PDF_OCR_DPI, PDF_OCR_MAX_PAGES, PDF_OCR_MIN_CHARS)
+from .pdf_raster import iter_pages_needing_ocr
+from .models import registry
+DOCTR_MODEL_ID = f"{DOCTR_DET_ARCH}+{DOCTR_RECO_ARCH}"
+# Everything that changes what DocTR sees for a file, used to key cached OCR artifacts
+OCR_ARTIFACT_ID = f"{DOCTR_MODEL_ID}|pdf:{PDF_OCR_DPI}dpi:{PDF_OCR_MAX_PAGES}p:{PDF_OCR_MIN_CHARS}c"
+DOCTR_IMAGE_EXTS = {'.png', '.jpg', '.jpeg'}
+
+def _load_doctr_predictor():
+    from doctr.models import ocr_predictor
+    return ocr_predictor(det_arch=DOCTR_DET_ARCH, reco_arch=DOCTR_RECO_ARCH, pretrained=True, det_bs=DOCTR_BATCH_SIZE)
 
 def _get_doctr_predictor():
-    global _doctr_predictor
-    if _doctr_predictor is not None:
-        return _doctr_predictor
-    try:
-        from doctr.models import ocr_predictor
-        _doctr_predictor = ocr_predictor(pretrained=True)
-    except Exception:
-        _doctr_predictor = None
-    return _doctr_predictor
+    return registry.get('doctr')
 
-def process_with_doctr(image_path: str) -> Dict[str, Any]:
+def _pages_to_data(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    lines: List[str] = []
+    for page in pages:
+        for block in page.get('blocks', []):
+            for line in block.get('lines', []):
+                line_text = ' '.join([w.get('value', '') for w in line.get('words', [])]).strip()
+                if line_text:
+                    lines.append(line_text)
+    return doctr_data_from_text('\n'.join(lines))
+
+def doctr_data_from_text(full_text: str) -> Dict[str, Any]:
+    """Build the process_with_doctr result from DocTR's raw text"""
+    data: Dict[str, Any] = {'raw_text': full_text, 'processing_tier': 'DocTR'}
+    first_line = next((ln for ln in full_text.splitlines() if ln.strip()), None)
+    if first_line:
+        data['vendor_name'] = first_line.strip()[:120]
+    return data
+
+def _iter_document_pages(paths: List[str]) -> Iterator[Tuple[int, Any]]:
+    """Yield (document index, page) for everything DocTR should read: every image, and only the
+    text-thin pages of PDFs, rasterized lazily."""
+    from doctr.io import DocumentFile
+    for i, path in enumerate(paths):
+        ext = os.path.splitext(path)[1].lower()
+        try:
+            if ext in DOCTR_IMAGE_EXTS:
+                for page in DocumentFile.from_images(path):
+                    yield i, page
+            elif ext == '.pdf':
+                for _, page in iter_pages_needing_ocr(path):
+                    yield i, page
+        except Exception as e:
+            print(f"Could not load {path} for DocTR: {e}")
+
+def process_with_doctr_batch(image_paths: List[str], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run DocTR over several documents, packing up to batch_size pages into each predictor call.
+    Returns one result per path, in order, shaped like process_with_doctr ({} when OCR is not possible)."""
+    results: List[Dict[str, Any]] = [{} for _ in image_paths]
     predictor = _get_doctr_predictor()
     if predictor is None:
-        return {}
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext not in {'.png', '.jpg', '.jpeg'}:
-        return {}
+        return results
+    batch_size = max(1, batch_size or DOCTR_BATCH_SIZE)
+    per_doc: Dict[int, List[Dict[str, Any]]] = {}
+    failed = set()
+    pages: List[Any] = []
+    owners: List[int] = []
+
+    def flush():
+        try:
+            exported = predictor(pages).export()
+        except Exception:
+            failed.update(owners)
+            return
+        for owner, page in zip(owners, exported.get('pages', [])):
+            per_doc.setdefault(owner, []).append(page)
+
     try:
-        from doctr.io import DocumentFile
-        doc = DocumentFile.from_images(image_path)
-        result = predictor(doc)
-        exported = result.export()
-        lines: List[str] = []
-        for page in exported.get('pages', []):
-            for block in page.get('blocks', []):
-                for line in block.get('lines', []):
-                    line_text = ' '.join([w.get('value', '') for w in line.get('words', [])]).strip()
-                    if line_text:
-                        lines.append(line_text)
-        full_text = '\n'.join(lines)
-        data: Dict[str, Any] = {'raw_text': full_text, 'processing_tier': 'DocTR'}
-        first_line = next((ln for ln in full_text.splitlines() if ln.strip()), None)
-        if first_line:
-            data['vendor_name'] = first_line.strip()[:120]
-        return data
+        for owner, page in _iter_document_pages(image_paths):
+            pages.append(page)
+            owners.append(owner)
+            if len(pages) >= batch_size:
+                flush()
+                pages, owners = [], []
+        if pages:
+            flush()
     except Exception:
-        return {}
+        return results
+    for owner, doc_pages in per_doc.items():
+        if owner not in failed:
+            results[owner] = _pages_to_data(doc_pages)
+    return results
+
+def process_with_doctr(image_path: str) -> Dict[str, Any]:
+    return process_with_doctr_batch([image_path])[0]
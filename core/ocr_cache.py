@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from .config import OCR_CACHE_DIR, OCR_CACHE_MEMORY_BYTES, OCR_CACHE_DISK_BYTES
+from .ocr import OCR_ARTIFACT_ID, doctr_data_from_text, process_with_doctr, process_with_doctr_batch
+from .utils import file_sha256
+from database import load_document_text, save_document_text
+
+class OCRCache:
+    """Two-level (memory LRU + disk) cache of DocTR outputs keyed by file content and model."""
+
+    def __init__(self, cache_dir: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._memory_sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # scanned once here, before the cache is shared, then kept up to date by put() and eviction
+        self._disk_bytes = self._scan_disk()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key_for(self, path: str, model_id: str = OCR_ARTIFACT_ID) -> str:
+        return self.key_for_hash(file_sha256(path), model_id)
+
+    def key_for_hash(self, content_hash: str, model_id: str = OCR_ARTIFACT_ID) -> str:
+        return hashlib.sha256(f"{content_hash}:{model_id}".encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key: str, data: Dict[str, Any], size: int):
+        if key in self._memory:
+            self._memory_bytes -= self._memory_sizes[key]
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        self._memory_sizes[key] = size
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes and len(self._memory) > 1:
+            old_key, _ = self._memory.popitem(last=False)
+            self._memory_bytes -= self._memory_sizes.pop(old_key)
+
+    def _scan_disk(self) -> int:
+        total = 0
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    total += entry.stat().st_size
+        return total
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk budget is met. Runs outside the cache
+        lock so readers are not blocked, and only one eviction runs at a time."""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = sorted(
+                (e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')),
+                key=lambda e: e.stat().st_mtime
+            )
+            for entry in entries:
+                with self._lock:
+                    if self._disk_bytes <= self.disk_max_bytes:
+                        break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                with self._lock:
+                    self._disk_bytes -= size
+        finally:
+            self._evict_lock.release()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(data)
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            data = json.loads(raw)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self._remember(key, data, len(raw))
+            self.hits += 1
+            self.disk_hits += 1
+        return dict(data)
+
+    def put(self, key: str, data: Dict[str, Any]):
+        raw = json.dumps(data)
+        with self._lock:
+            self._remember(key, dict(data), len(raw))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(key)
+            try:
+                # an overwritten entry no longer counts against the budget
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._disk_bytes += len(raw) - replaced
+                over_budget = self._disk_bytes > self.disk_max_bytes
+            if over_budget:
+                self._evict_disk()
+        except OSError as e:
+            print(f"Could not write OCR cache entry: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+            }
+
+_ocr_cache = None
+
+def get_ocr_cache() -> OCRCache:
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = OCRCache(OCR_CACHE_DIR, OCR_CACHE_MEMORY_BYTES, OCR_CACHE_DISK_BYTES)
+    return _ocr_cache
+
+def _load_persisted(content_hash: str) -> Optional[Dict[str, Any]]:
+    try:
+        text = load_document_text(content_hash, 'doctr', OCR_ARTIFACT_ID)
+    except Exception as e:
+        print(f"Could not load stored DocTR text: {e}")
+        return None
+    return doctr_data_from_text(text) if text is not None else None
+
+def _persist(content_hash: str, data: Dict[str, Any]):
+    try:
+        save_document_text(content_hash, 'doctr', OCR_ARTIFACT_ID, data.get('raw_text', '') or '')
+    except Exception as e:
+        print(f"Could not store DocTR text: {e}")
+
+def _lookup(cache: OCRCache, content_hash: str) -> Optional[Dict[str, Any]]:
+    key = cache.key_for_hash(content_hash)
+    data = cache.get(key)
+    if data is None:
+        data = _load_persisted(content_hash)
+        if data is not None:
+            cache.put(key, data)
+    return data
+
+def _store(cache: OCRCache, content_hash: str, data: Dict[str, Any]):
+    if data:
+        cache.put(cache.key_for_hash(content_hash), data)
+        _persist(content_hash, data)
+
+def cached_process_with_doctr(image_path: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Drop-in replacement for process_with_doctr that runs DocTR at most once per unique document.
+    Lookups go memory -> disk cache -> persisted text layer in the database. Pass content_hash (the
+    file's SHA-256) when it is already known to avoid reading the file again."""
+    cache = get_ocr_cache()
+    if content_hash is None:
+        try:
+            content_hash = file_sha256(image_path)
+        except OSError:
+            return process_with_doctr(image_path)
+    data = _lookup(cache, content_hash)
+    if data is not None:
+        return data
+    data = process_with_doctr(image_path)
+    _store(cache, content_hash, data)
+    return data
+
+def cached_process_with_doctr_batch(image_paths: List[str], batch_size: Optional[int] = None,
+                                    content_hashes: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+    """Batched variant of cached_process_with_doctr: only cache misses go to DocTR, in batches.
+    content_hashes, if given, holds each path's known SHA-256 (or None to hash the file)."""
+    cache = get_ocr_cache()
+    results: List[Dict[str, Any]] = [{} for _ in image_paths]
+    misses = []
+    for i, path in enumerate(image_paths):
+        content_hash = content_hashes[i] if content_hashes else None
+        if content_hash is None:
+            try:
+                content_hash = file_sha256(path)
+            except OSError:
+                continue
+        data = _lookup(cache, content_hash)
+        if data is not None:
+            results[i] = data
+        else:
+            misses.append((i, path, content_hash))
+    if misses:
+        fresh = process_with_doctr_batch([path for _, path, _ in misses], batch_size)
+        for (i, _, content_hash), data in zip(misses, fresh):
+            _store(cache, content_hash, data)
+            results[i] = data
+    return results
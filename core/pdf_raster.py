@@ -0,0 +1,32 @@
+from typing import Iterator, Tuple, Any
+from .config import PDF_OCR_DPI, PDF_OCR_MAX_PAGES, PDF_OCR_MIN_CHARS
+
+def iter_pages_needing_ocr(pdf_path: str, min_chars: int = PDF_OCR_MIN_CHARS,
+                           max_pages: int = PDF_OCR_MAX_PAGES, dpi: int = PDF_OCR_DPI) -> Iterator[Tuple[int, Any]]:
+    """Yield (page_index, RGB numpy array) for pages whose text layer has fewer than min_chars
+    characters. Pages are rendered one at a time, only when needed, and at most max_pages are yielded."""
+    import numpy as np
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        yielded = 0
+        for index in range(len(pdf)):
+            if yielded >= max_pages:
+                break
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    chars = len(textpage.get_text_range().strip())
+                finally:
+                    textpage.close()
+                if chars >= min_chars:
+                    continue
+                bitmap = page.render(scale=dpi / 72)
+                image = np.asarray(bitmap.to_pil().convert('RGB'))
+            finally:
+                page.close()
+            yielded += 1
+            yield index, image
+    finally:
+        pdf.close()
@@ -1,10 +1,18 @@
-from typing import Dict, Any, Optional
-from .ocr import process_with_doctr
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from .config import INVOICE_LATENCY_BUDGET_SECONDS, DUPLICATE_DETECTION
+from .duplicates import duplicate_key
+from .ocr_cache import cached_process_with_doctr
 from .regex_extract import process_invoice_regex
-from .qa import process_with_text_qa
+from .qa import process_with_text_qa, process_with_text_qa_batch
 from .llm import process_with_llm
 from .utils import has_any_field, is_company_like_line
-from database import save_to_db
+from .keywords import CATEGORIES, keyword_hits, keyword_set
+from .staging import ResultStage
+from .vendor_master import vendor_master
+from database import find_duplicate
+
+_RESULT_FIELDS = ('vendor_name', 'invoice_number', 'invoice_date', 'total_amount', 'vendor_gstin', 'customer_gstin')
 
 def get_next_tier(current_tier: Optional[str]) -> Optional[str]:
     """Determine the next processing tier based on the current tier"""
@@ -41,6 +49,30 @@ def get_alternative_tier(current_tier: Optional[str]) -> Optional[str]:
     }
     return alternatives.get(current_tier)
 
+def combine_texts(original_text: str, doctr_text: str) -> str:
+    """Append DocTR lines to the original text, dropping duplicate lines"""
+    if not doctr_text:
+        return original_text
+    combined_lines = []
+    seen = set()
+    for ln in (original_text.splitlines() + doctr_text.splitlines()):
+        k = ln.strip()
+        if k and k not in seen:
+            seen.add(k)
+            combined_lines.append(ln)
+    return '\n'.join(combined_lines)
+
+def run_doctr_and_combine(image_path: str, original_text: str,
+                          content_hash: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+    """Run (cached) DocTR on the file and merge its text with the original text. content_hash is the
+    file's SHA-256 when the caller already has it."""
+    doctr_data: Dict[str, Any] = {}
+    try:
+        doctr_data = cached_process_with_doctr(image_path, content_hash) or {}
+    except Exception:
+        pass
+    return doctr_data, combine_texts(original_text, doctr_data.get('raw_text', '') or '')
+
 def run_specific_tier(image_path: str, text_content: str, target_tier: str) -> Optional[Dict[str, Any]]:
     """Run a specific processing tier"""
     original_text = text_content or ''
@@ -52,27 +84,8 @@ def run_specific_tier(image_path: str, text_content: str, target_tier: str) -> O
             return result
     
     elif target_tier == 'Regex+DocTR':
-        # Get DocTR OCR data
-        doctr_data: Dict[str, Any] = {}
-        doctr_text = ''
-        try:
-            doctr_data = process_with_doctr(image_path) or {}
-            doctr_text = doctr_data.get('raw_text', '') or ''
-        except Exception:
-            pass
-        
-        # Combine texts
-        if doctr_text:
-            combined_lines = []
-            seen = set()
-            for ln in (original_text.splitlines() + doctr_text.splitlines()):
-                k = ln.strip()
-                if k and k not in seen:
-                    seen.add(k)
-                    combined_lines.append(ln)
-            combined_text = '\n'.join(combined_lines)
-        else:
-            combined_text = original_text
+        # Get DocTR OCR data and combine texts
+        doctr_data, combined_text = run_doctr_and_combine(image_path, original_text)
         
         heuristic = process_invoice_regex(combined_text)
         from .merge import merge_tier1_tier2
@@ -82,25 +95,7 @@ def run_specific_tier(image_path: str, text_content: str, target_tier: str) -> O
             return result
     
     elif target_tier == 'Text_QA':
-        doctr_data: Dict[str, Any] = {}
-        doctr_text = ''
-        try:
-            doctr_data = process_with_doctr(image_path) or {}
-            doctr_text = doctr_data.get('raw_text', '') or ''
-        except Exception:
-            pass
-        
-        if doctr_text:
-            combined_lines = []
-            seen = set()
-            for ln in (original_text.splitlines() + doctr_text.splitlines()):
-                k = ln.strip()
-                if k and k not in seen:
-                    seen.add(k)
-                    combined_lines.append(ln)
-            combined_text = '\n'.join(combined_lines)
-        else:
-            combined_text = original_text
+        _, combined_text = run_doctr_and_combine(image_path, original_text)
         
         qa_source_parts = [combined_text]
         try:
@@ -116,25 +111,7 @@ def run_specific_tier(image_path: str, text_content: str, target_tier: str) -> O
             return None
     
     elif target_tier == 'LLM':
-        doctr_data: Dict[str, Any] = {}
-        doctr_text = ''
-        try:
-            doctr_data = process_with_doctr(image_path) or {}
-            doctr_text = doctr_data.get('raw_text', '') or ''
-        except Exception:
-            pass
-        
-        if doctr_text:
-            combined_lines = []
-            seen = set()
-            for ln in (original_text.splitlines() + doctr_text.splitlines()):
-                k = ln.strip()
-                if k and k not in seen:
-                    seen.add(k)
-                    combined_lines.append(ln)
-            combined_text = '\n'.join(combined_lines)
-        else:
-            combined_text = original_text
+        _, combined_text = run_doctr_and_combine(image_path, original_text)
         
         result = process_with_llm(combined_text)
         if result:
@@ -143,6 +120,9 @@ def run_specific_tier(image_path: str, text_content: str, target_tier: str) -> O
     
     return None
 
+_VENDOR_REJECT = keyword_set("invoice no", "invoice", "gstin", "dated", "tax invoice", "party :", "party:",
+                             "bill to", "ship to", "address", "order no", "prepared by", "amount")
+
 def is_output_valid(data):
     if not isinstance(data, dict):
         return False
@@ -150,16 +130,10 @@ def is_output_valid(data):
     total = data.get("total_amount")
     if not vendor or total is None:
         return False
-    bad_tokens = [
-        "invoice no", "invoice", "gstin", "dated", "tax invoice", "party :", "party:",
-        "bill to", "ship to", "address", "order no", "prepared by", "amount"
-    ]
-    low = vendor.lower()
-    if any(t in low for t in bad_tokens):
+    hits = keyword_hits(vendor.lower())
+    if hits & _VENDOR_REJECT:
         return False
-    address_tokens = ["road", "rd", "street", "st ", "st.", "lane", "ln", "complex", "tower",
-                      "floor", "opp", "near", "shop", "block", "sector", "phase", "plot", "no.", "no "]
-    if any(tok in low for tok in address_tokens):
+    if hits & CATEGORIES['address']:
         digits = sum(c.isdigit() for c in vendor)
         if digits >= 2 or vendor.count(',') >= 1:
             return False
@@ -168,58 +142,224 @@ def is_output_valid(data):
         return False
     return True
 
-def run_full_pipeline(image_path, text_content):
+def _keep_known_vendor(result: Dict[str, Any], known_vendor: Optional[str]) -> Dict[str, Any]:
+    """Put the vendor master's name back after a later tier's output replaced it"""
+    if known_vendor:
+        result['vendor_name'] = known_vendor
+    return result
+
+def _regex_only(text_content) -> Tuple[Dict[str, Any], bool, bool]:
     pre_regex = process_invoice_regex(text_content or '') if text_content else {}
+    # A vendor GSTIN verified before gives the canonical name; with a total the invoice is done
+    known_vendor = vendor_master.lookup(pre_regex.get('vendor_gstin')) if isinstance(pre_regex, dict) else None
+    if known_vendor:
+        pre_regex['vendor_name'] = known_vendor
+        total = pre_regex.get('total_amount')
+        return pre_regex, isinstance(total, (int, float)) and total > 0, True
     vendor_ok = is_company_like_line((pre_regex.get('vendor_name') or '')) if isinstance(pre_regex, dict) else False
-    if is_output_valid(pre_regex) and vendor_ok:
+    return pre_regex, is_output_valid(pre_regex) and vendor_ok, False
+
+def regex_tier(text_content) -> Tuple[Dict[str, Any], bool, bool]:
+    """The RegexOnly result, whether it finishes the document (False means DocTR will run) and
+    whether the vendor name came from the vendor master. Pass it to run_full_pipeline as
+    regex_result so the tier is not run twice."""
+    return _regex_only(text_content)
+
+def _notify(progress: Optional[Callable[[str, str], None]], tier: str, event: str):
+    if progress is None:
+        return
+    try:
+        progress(tier, event)
+    except Exception as e:
+        print(f"Progress callback failed for {tier}: {e}")
+
+def _find_original(result: Dict[str, Any], image_path: str) -> Optional[Dict[str, Any]]:
+    """The earlier invoice this one duplicates, judged on its GSTIN, number, date and amount"""
+    if not DUPLICATE_DETECTION:
+        return None
+    key = duplicate_key(result)
+    if not key:
+        return None
+    try:
+        return find_duplicate(key, image_path)
+    except Exception as e:
+        print(f"Duplicate lookup failed: {e}")
+        return None
+
+def _begin(stage: ResultStage, progress: Optional[Callable[[str, str], None]], tier: str):
+    _notify(progress, tier, 'started')
+    stage.begin(tier)
+
+def _end(stage: ResultStage, progress: Optional[Callable[[str, str], None]], tier: str, output: Dict[str, Any]):
+    stage.end(tier, output)
+    _notify(progress, tier, 'finished')
+
+def _over_budget(started_at: float, tier: str, stage: ResultStage, progress: Optional[Callable[[str, str], None]]) -> bool:
+    """True (and reports the tier as 'skipped') when the invoice's latency budget is already spent"""
+    if INVOICE_LATENCY_BUDGET_SECONDS <= 0:
+        return False
+    elapsed = time.monotonic() - started_at
+    if elapsed < INVOICE_LATENCY_BUDGET_SECONDS:
+        return False
+    print(f"Skipping {tier}: {elapsed:.1f}s spent of the {INVOICE_LATENCY_BUDGET_SECONDS:g}s budget")
+    stage.skip(tier)
+    _notify(progress, tier, 'skipped')
+    return True
+
+def _stage_skipped(stage: ResultStage, best: Dict[str, Any], image_path: str, tier: str):
+    """Stage the best result so far, noting the tier that was skipped for lack of time"""
+    best = dict(best)
+    best['file_path'] = image_path
+    best['skipped_tier'] = tier
+    if has_any_field(best):
+        best['status'] = 'SUCCESS' if is_output_valid(best) else 'PARTIAL'
+    else:
+        best['status'] = 'FAILED'
+    stage.stage(best)
+
+def run_full_pipeline(image_path, text_content, progress: Optional[Callable[[str, str], None]] = None,
+                      started_at: Optional[float] = None, content_hash: Optional[str] = None,
+                      regex_result: Optional[Tuple[Dict[str, Any], bool, bool]] = None):
+    """Run the tier ladder and save the best result with a single write. progress(tier, event) is
+    called with event 'started'/'finished' around each tier, or 'skipped' when the latency budget
+    (INVOICE_LATENCY_BUDGET_SECONDS, counted from the time.monotonic() value started_at)
+    ran out before an expensive tier. content_hash (the file's SHA-256) is stored with the result
+    so later uploads of the same bytes can reuse it. regex_result is a regex_tier() result already
+    computed for this text."""
+    stage = ResultStage(image_path, content_hash)
+    try:
+        state = _run_to_text_qa(stage, image_path, text_content, progress,
+                                started_at if started_at is not None else time.monotonic(), regex_result)
+        if state is not None:
+            _begin(stage, progress, 'Text_QA')
+            _run_from_text_qa(state, process_with_text_qa(state['qa_input']))
+    finally:
+        # also keeps the best result so far if a tier raised
+        stage.commit()
+
+def run_pipelines(runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """run_full_pipeline for a group of documents, with the ones that reach Text_QA answered by one
+    batched model call. Each run holds image_path and text_content, and optionally progress,
+    content_hash, regex_result and spent (seconds already charged to its latency budget, e.g.
+    extraction). Every document's clock only runs during its own work plus its share of the batched
+    call. Returns {'error': exception or None, 'seconds': pipeline seconds charged} per run."""
+    out = [{'error': None, 'seconds': 0.0} for _ in runs]
+    stages = [ResultStage(run['image_path'], run.get('content_hash')) for run in runs]
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    for i, run in enumerate(runs):
+        t0 = time.monotonic()
+        state = None
+        try:
+            state = _run_to_text_qa(stages[i], run['image_path'], run.get('text_content'), run.get('progress'),
+                                    t0 - run.get('spent', 0.0), run.get('regex_result'))
+        except Exception as e:
+            out[i]['error'] = e
+        if state is None:
+            _commit_run(stages[i], out[i])
+        else:
+            pending.append((i, state))
+        out[i]['seconds'] += time.monotonic() - t0
+    if not pending:
+        return out
+    for i, state in pending:
+        _begin(stages[i], state['progress'], 'Text_QA')
+    t0 = time.monotonic()
+    try:
+        answers = process_with_text_qa_batch([state['qa_input'] for _, state in pending])
+    except Exception as e:
+        for i, _ in pending:
+            out[i]['error'] = e
+            _commit_run(stages[i], out[i])
+        return out
+    share = (time.monotonic() - t0) / len(pending)
+    for (i, state), qa_data in zip(pending, answers):
+        t0 = time.monotonic()
+        state['started_at'] = t0 - runs[i].get('spent', 0.0) - out[i]['seconds'] - share
+        try:
+            _run_from_text_qa(state, qa_data)
+        except Exception as e:
+            out[i]['error'] = e
+        _commit_run(stages[i], out[i])
+        out[i]['seconds'] += share + time.monotonic() - t0
+    return out
+
+def _commit_run(stage: ResultStage, outcome: Dict[str, Any]):
+    try:
+        stage.commit()
+    except Exception as e:
+        outcome['error'] = outcome['error'] or e
+
+def _field_count(d: Dict[str, Any]) -> int:
+    return sum(1 for k in _RESULT_FIELDS if d.get(k) not in (None, ''))
+
+def _run_to_text_qa(stage: ResultStage, image_path, text_content, progress: Optional[Callable[[str, str], None]],
+                    started_at: float, regex_result: Optional[Tuple[Dict[str, Any], bool, bool]] = None
+                    ) -> Optional[Dict[str, Any]]:
+    """The tiers up to Text_QA. Returns None when the invoice is finished (its result staged), else
+    the state _run_from_text_qa continues from, with the Text_QA input under 'qa_input'."""
+    _begin(stage, progress, 'RegexOnly')
+    pre_regex, regex_ok, known_vendor = regex_result if regex_result is not None else _regex_only(text_content)
+    _end(stage, progress, 'RegexOnly', pre_regex)
+    if known_vendor:
+        # counted here, once per invoice, whether or not the regex pass ran ahead of the pipeline
+        vendor_master.record_hit()
+    # the verified name outranks whatever DocTR, Text_QA or the LLM read
+    known_name = pre_regex.get('vendor_name') if known_vendor else None
+    original = _find_original(pre_regex, image_path)
+    if original:
+        print(f"{image_path} duplicates invoice {original['id']} ({original['filename']}), skipping later tiers")
+        duplicate = {k: original.get(k) for k in _RESULT_FIELDS}
+        duplicate.update(file_path=image_path, processing_tier='RegexOnly', status='DUPLICATE',
+                         duplicate_of=original['id'])
+        stage.stage(duplicate)
+        return None
+    if regex_ok:
         pre_regex['file_path'] = image_path
         pre_regex.setdefault('status', 'SUCCESS')
         pre_regex['processing_tier'] = 'RegexOnly'
-        save_to_db(pre_regex)
-        return
+        stage.stage(pre_regex)
+        return None
     original_text = text_content or ''
-    doctr_data: Dict[str, Any] = {}
-    doctr_text = ''
-    try:
-        doctr_data = process_with_doctr(image_path) or {}
-        doctr_text = doctr_data.get('raw_text', '') or ''
-    except Exception:
-        pass
-    if doctr_text:
-        combined_lines = []
-        seen = set()
-        for ln in (original_text.splitlines() + doctr_text.splitlines()):
-            k = ln.strip()
-            if k and k not in seen:
-                seen.add(k)
-                combined_lines.append(ln)
-        combined_text = '\n'.join(combined_lines)
-    else:
-        combined_text = original_text
+    if _over_budget(started_at, 'Regex+DocTR', stage, progress):
+        pre_regex['processing_tier'] = 'RegexOnly'
+        _stage_skipped(stage, pre_regex, image_path, 'Regex+DocTR')
+        return None
+    _begin(stage, progress, 'Regex+DocTR')
+    doctr_data, combined_text = run_doctr_and_combine(image_path, original_text, stage.content_hash)
     heuristic = process_invoice_regex(combined_text)
     from .merge import merge_tier1_tier2
-    merged = merge_tier1_tier2(heuristic, doctr_data)
+    merged = _keep_known_vendor(merge_tier1_tier2(heuristic, doctr_data), known_name)
     merged['file_path'] = image_path
     merged.setdefault('status', 'SUCCESS' if is_output_valid(merged) else 'PARTIAL')
-    save_to_db(merged)
+    stage.stage(merged)
+    _end(stage, progress, 'Regex+DocTR', merged)
     if is_output_valid(merged):
-        return
-    def field_count(d: Dict[str, Any]):
-        keys = ['vendor_name', 'invoice_number', 'invoice_date', 'total_amount', 'vendor_gstin', 'customer_gstin']
-        return sum(1 for k in keys if d.get(k) not in (None, ''))
-    baseline_count = field_count(merged)
+        return None
     qa_source_parts = [combined_text]
     for k in ['vendor_name', 'invoice_number']:
         v = merged.get(k)
         if isinstance(v, str):
             qa_source_parts.append(v)
-    qa_data = process_with_text_qa('\n'.join(qa_source_parts))
+    if _over_budget(started_at, 'Text_QA', stage, progress):
+        _stage_skipped(stage, merged, image_path, 'Text_QA')
+        return None
+    return {'stage': stage, 'image_path': image_path, 'progress': progress, 'started_at': started_at,
+            'merged': merged, 'combined_text': combined_text, 'qa_input': '\n'.join(qa_source_parts),
+            'known_vendor': known_name}
+
+def _run_from_text_qa(state: Dict[str, Any], qa_data: Dict[str, Any]):
+    """Text_QA's answers merged in, then the LLM tier if the invoice is still incomplete"""
+    stage, image_path, progress = state['stage'], state['image_path'], state['progress']
+    merged, combined_text, started_at = state['merged'], state['combined_text'], state['started_at']
+    known_vendor = state.get('known_vendor')
+    baseline_count = _field_count(merged)
+    _end(stage, progress, 'Text_QA', qa_data)
     if has_any_field(qa_data):
         qa_merged = dict(merged)
         improved = False
         for key in ['vendor_name','invoice_date','vendor_gstin','customer_gstin']:
             val = qa_data.get(key)
-            if val and val != qa_merged.get(key):
+            if val and val != qa_merged.get(key) and not (key == 'vendor_name' and known_vendor):
                 qa_merged[key] = val
                 improved = True
         if qa_data.get('invoice_number'):
@@ -239,20 +379,26 @@ def run_full_pipeline(image_path, text_content):
         qa_merged['processing_tier'] = qa_data.get('processing_tier','Text_QA')
         qa_merged['file_path'] = image_path
         qa_merged.setdefault('status', 'SUCCESS' if is_output_valid(qa_merged) else 'PARTIAL')
-        qa_count = field_count(qa_merged)
+        qa_count = _field_count(qa_merged)
         if improved and (qa_count > baseline_count or (not is_output_valid(merged) and is_output_valid(qa_merged))):
-            save_to_db(qa_merged)
+            stage.stage(qa_merged)
             if is_output_valid(qa_merged):
                 return
             merged = qa_merged
             baseline_count = qa_count
+    if _over_budget(started_at, 'LLM', stage, progress):
+        _stage_skipped(stage, merged, image_path, 'LLM')
+        return
+    _begin(stage, progress, 'LLM')
     llm_out = process_with_llm(combined_text)
+    _end(stage, progress, 'LLM', llm_out)
     if has_any_field(llm_out):
-        llm_count = field_count(llm_out)
+        llm_out = _keep_known_vendor(dict(llm_out), known_vendor)
+        llm_count = _field_count(llm_out)
         if llm_count > baseline_count or (not is_output_valid(merged) and is_output_valid(llm_out)):
             llm_out['file_path'] = image_path
             llm_out.setdefault('status', 'SUCCESS' if is_output_valid(llm_out) else 'PARTIAL')
-            save_to_db(llm_out)
+            stage.stage(llm_out)
             if is_output_valid(llm_out):
                 return
             merged = llm_out
@@ -260,4 +406,4 @@ def run_full_pipeline(image_path, text_content):
     if not is_output_valid(merged):
         pass
     if not has_any_field(merged):
-        save_to_db({ 'file_path': image_path, 'status': 'FAILED', 'processing_tier': 'ALL_TIERS' })
+        stage.stage({ 'file_path': image_path, 'status': 'FAILED', 'processing_tier': 'ALL_TIERS' })
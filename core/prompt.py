@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Any, Iterable, List, Tuple
+from .config import LLM_PROMPT_TOKEN_BUDGET, LLM_CHARS_PER_TOKEN
+from .document import ParsedDocument
+from .gstin import _gstin_matches
+from .regex_extract import _TOTAL_LINE_KEYWORDS
+
+_GAP_MARKER = '...'
+_GSTIN_CONTEXT_LINES = 2  # lines kept on each side of a GSTIN (party name, address, state)
+_TOTAL_CONTEXT_LINES = 1
+_LABEL_KEYWORDS = ('invoice', 'dated', 'date')
+_HEADER_LINES = 25  # vendor block, parties and invoice number/date sit at the top
+_SUMMARY_LINES = 12
+
+_stats_lock = threading.Lock()
+_stats = {'calls': 0, 'pruned_calls': 0, 'chars_in': 0, 'chars_sent': 0}
+
+def _windows(indices: Iterable[int], radius: int, n: int) -> List[int]:
+    out = []
+    for i in indices:
+        out.extend(range(max(0, i - radius), min(n, i + radius + 1)))
+    return out
+
+def _select_lines(doc: ParsedDocument, budget_chars: int) -> List[int]:
+    """Line indices to keep, taken in priority order while the budget lasts: lines around GSTINs, total
+    lines (last first, where the grand total usually is), invoice number/date lines, the top of the
+    header and the top of the summary. Line-item rows in between are left out."""
+    n = len(doc.lines)
+    gstin_lines = sorted({doc.line_index(m.start()) for m in _gstin_matches(doc.text)})
+    total_lines = list(reversed(doc.lines_with(_TOTAL_LINE_KEYWORDS)))
+    summary_end = min(n, doc.header_line_count + _SUMMARY_LINES) if doc.summary_start is not None else 0
+    order = (_windows(gstin_lines, _GSTIN_CONTEXT_LINES, n)
+             + _windows(total_lines, _TOTAL_CONTEXT_LINES, n)
+             + doc.lines_with(_LABEL_KEYWORDS)
+             + list(range(min(n, _HEADER_LINES)))
+             + list(range(doc.header_line_count, summary_end)))
+    selected = set()
+    used = 0
+    for i in order:
+        ln = doc.stripped[i]
+        if not ln or i in selected:
+            continue
+        cost = len(ln) + 1
+        if used + cost > budget_chars:
+            continue
+        selected.add(i)
+        used += cost
+    return sorted(selected)
+
+def build_llm_context(text: str, token_budget: int = LLM_PROMPT_TOKEN_BUDGET) -> Tuple[str, Dict[str, Any]]:
+    """Invoice text for the LLM prompt, cut down to roughly token_budget tokens. Text that already fits
+    is sent as is; longer text keeps only the lines relevant to the extracted fields, with '...' where
+    lines were left out. Returns (context, stats) where stats has the characters in, sent and saved."""
+    budget_chars = max(1, token_budget) * LLM_CHARS_PER_TOKEN
+    if len(text) <= budget_chars:
+        context = text
+    else:
+        doc = ParsedDocument(text)
+        parts: List[str] = []
+        prev = -1
+        for i in _select_lines(doc, budget_chars):
+            if any(doc.stripped[j] for j in range(prev + 1, i)):
+                parts.append(_GAP_MARKER)
+            parts.append(doc.stripped[i])
+            prev = i
+        if any(doc.stripped[j] for j in range(prev + 1, len(doc.lines))):
+            parts.append(_GAP_MARKER)
+        context = '\n'.join(parts)
+    stats = {'chars_in': len(text), 'chars_sent': len(context), 'chars_saved': len(text) - len(context)}
+    with _stats_lock:
+        _stats['calls'] += 1
+        _stats['pruned_calls'] += context is not text
+        _stats['chars_in'] += stats['chars_in']
+        _stats['chars_sent'] += stats['chars_sent']
+    return context, stats
+
+def prompt_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return dict(_stats, chars_saved=_stats['chars_in'] - _stats['chars_sent'])
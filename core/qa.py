@@ -1,46 +1,99 @@
-from typing import Dict, Any
-from transformers.pipelines import pipeline
-from .config import QA_MODEL, GSTIN_REGEX
+import os
+import re
+from typing import Dict, Any, List, Optional
+from .config import QA_MODEL, QA_BATCH_SIZE, QA_QUANTIZE, QA_QUANT_CACHE_DIR, GSTIN_REGEX
 from .utils import parse_date_str, clean_amount, is_company_like_line, normalize_invoice_number
+from .keywords import keyword_hits, keyword_set
+from .models import registry
 
-_qa_pipeline = None
+_BAD_VENDOR_TOKENS = keyword_set('inr', 'thousand', 'hundred', 'only', 'gstin', 'invoice', 'amount')
 
-def _get_qa_pipeline():
-    global _qa_pipeline
-    if _qa_pipeline is not None:
-        return _qa_pipeline
+def _load_int8_model(model_id: str):
+    """QA model with its linear layers dynamically quantized to int8 for CPU inference. The quantized
+    weights are saved under QA_QUANT_CACHE_DIR; later starts rebuild the quantized architecture from
+    the model config and load them (tensors only, nothing is unpickled) instead of converting again."""
+    import torch
+    import transformers
+    from transformers import AutoConfig, AutoModelForQuestionAnswering
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)
+    path = os.path.join(QA_QUANT_CACHE_DIR,
+                        f"{safe_id}.int8.torch-{torch.__version__}.transformers-{transformers.__version__}.state.pt")
+    if os.path.exists(path):
+        try:
+            model = AutoModelForQuestionAnswering.from_config(AutoConfig.from_pretrained(model_id)).eval()
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            model.load_state_dict(torch.load(path, weights_only=True))
+            return model
+        except Exception as e:
+            print(f"Could not load quantized QA weights {path}, converting again: {e}")
+    model = AutoModelForQuestionAnswering.from_pretrained(model_id).eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
     try:
-        _qa_pipeline = pipeline("question-answering", model=QA_MODEL, tokenizer=QA_MODEL)
-    except Exception:
-        _qa_pipeline = None
-    return _qa_pipeline
+        os.makedirs(QA_QUANT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache quantized QA weights: {e}")
+    return model
 
-def process_with_text_qa(text: str) -> Dict[str, Any]:
-    qa = _get_qa_pipeline()
-    if not qa or not text.strip():
-        return {}
-    questions = {
-        "vendor_name": "What is the registered legal name of the vendor company?",
-        "invoice_number": "Provide only the invoice number (exact code).",
-        "invoice_date": "What is the invoice date (day month year)?",
-        "total_amount": "What is the grand total amount (numbers only)?",
-        "vendor_gstin": "Provide only the 15-character vendor GSTIN code.",
-        "customer_gstin": "Provide only the 15-character customer GSTIN code."
-    }
+def _load_qa_pipeline():
+    from transformers.pipelines import pipeline
+    model = _load_int8_model(QA_MODEL) if QA_QUANTIZE == 'int8' else QA_MODEL
+    return pipeline("question-answering", model=model, tokenizer=QA_MODEL)
+
+def _get_qa_pipeline():
+    return registry.get('qa')
+
+QUESTIONS = {
+    "vendor_name": "What is the registered legal name of the vendor company?",
+    "invoice_number": "Provide only the invoice number (exact code).",
+    "invoice_date": "What is the invoice date (day month year)?",
+    "total_amount": "What is the grand total amount (numbers only)?",
+    "vendor_gstin": "Provide only the 15-character vendor GSTIN code.",
+    "customer_gstin": "Provide only the 15-character customer GSTIN code."
+}
+_QA_CONTEXT_CHARS = 12000
+
+def _answer_text(result) -> Optional[str]:
+    # Handle transformers pipeline result properly
+    if isinstance(result, dict) and "answer" in result:
+        ans = result["answer"]
+        if ans and ans.lower() not in {"", "n/a", "none", "no"}:
+            return ans.strip()
+    return None
+
+def _ask_one_by_one(qa, ctx: str) -> Dict[str, Any]:
     answers: Dict[str, Any] = {}
-    for field, q in questions.items():
+    for field, q in QUESTIONS.items():
         try:
-            ctx = text[:12000]
-            result = qa(question=q, context=ctx)
-            # Handle transformers pipeline result properly
-            if isinstance(result, dict) and "answer" in result:
-                ans = result["answer"]
-            else:
-                continue
-            if ans and ans.lower() not in {"", "n/a", "none", "no"}:
-                answers[field] = ans.strip()
+            ans = _answer_text(qa(question=q, context=ctx))
+            if ans is not None:
+                answers[field] = ans
         except Exception:
             pass
+    return answers
+
+def _ask_batched(qa, contexts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """Every question for every context in one pipeline call, run batch_size pairs per forward pass.
+    Only the forward passes are shared: the pipeline encodes each question together with its context,
+    so a context is tokenized once per question."""
+    fields = list(QUESTIONS)
+    inputs = [{'question': QUESTIONS[f], 'context': ctx} for ctx in contexts for f in fields]
+    results = qa(inputs, batch_size=batch_size)
+    if isinstance(results, dict):
+        results = [results]
+    out: List[Dict[str, Any]] = []
+    for i in range(len(contexts)):
+        answers: Dict[str, Any] = {}
+        for field, result in zip(fields, results[i * len(fields):(i + 1) * len(fields)]):
+            ans = _answer_text(result)
+            if ans is not None:
+                answers[field] = ans
+        out.append(answers)
+    return out
+
+def _clean_answers(answers: Dict[str, Any]) -> Dict[str, Any]:
     if 'invoice_date' in answers:
         d = parse_date_str(answers['invoice_date'])
         if d:
@@ -70,9 +123,8 @@ def process_with_text_qa(text: str) -> Dict[str, Any]:
     vn = answers.get('vendor_name')
     if vn:
         vn_clean = vn.strip()
-        bad_vendor_tokens = {'inr','thousand','hundred','only','gstin','invoice','amount'}
         lower_v = vn_clean.lower()
-        if (lower_v.startswith('inr ') or any(t in lower_v for t in bad_vendor_tokens)
+        if (lower_v.startswith('inr ') or keyword_hits(lower_v) & _BAD_VENDOR_TOKENS
             or len(vn_clean) < 3 or sum(c.isalpha() for c in vn_clean) < 3
             or not is_company_like_line(vn_clean)):
             answers.pop('vendor_name', None)
@@ -82,3 +134,24 @@ def process_with_text_qa(text: str) -> Dict[str, Any]:
     if answers:
         answers['processing_tier'] = 'Text_QA'
     return answers
+
+def process_with_text_qa(text: str) -> Dict[str, Any]:
+    return process_with_text_qa_batch([text])[0]
+
+def process_with_text_qa_batch(texts: List[str], batch_size: int = QA_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Text_QA for several documents at once: all questions for all documents go to the model as one
+    batched call. Falls back to asking question by question if the batched call fails."""
+    qa = _get_qa_pipeline()
+    results: List[Dict[str, Any]] = [{} for _ in texts]
+    idx = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not qa or not idx:
+        return results
+    contexts = [texts[i][:_QA_CONTEXT_CHARS] for i in idx]
+    try:
+        raw = _ask_batched(qa, contexts, max(1, batch_size))
+    except Exception as e:
+        print(f"Batched Text_QA failed, asking questions one by one: {e}")
+        raw = [_ask_one_by_one(qa, ctx) for ctx in contexts]
+    for i, answers in zip(idx, raw):
+        results[i] = _clean_answers(answers)
+    return results
@@ -2,50 +2,127 @@ import re
 from typing import Dict, Any, List, Optional
 from .utils import clean_amount, parse_date_str, is_company_like_line, normalize_invoice_number
 from .gstin import extract_gstin_roles_and_vendor
+from .document import ParsedDocument, _SUMMARY_RE
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# Every invoice-number pattern (and the "Invoice Date" pattern) starts with the word "Invoice",
+# so one scan for that word yields every position at which they can match.
+# (pattern, offset of the pattern start relative to the "Invoice" it contains), in priority order
+_INVOICE_NUMBER_RES = [
+    (re.compile(r'Invoice\s*No\.?\s*[:#-]?\s*([A-Z0-9/-]{3,})', _FLAGS), 0),
+    (re.compile(r'Invoice\s*#\s*([A-Z0-9/-]{3,})', _FLAGS), 0),
+    (re.compile(r'Invoice\s*Number\s*[:#-]?\s*([A-Z0-9/-]{3,})', _FLAGS), 0),
+    (re.compile(r'Invoice Code\s*[:#-]?\s*([A-Z0-9/-]{3,})', _FLAGS), 0),
+    (re.compile(r'Tax Invoice#\s*([A-Z0-9/-]{3,})', _FLAGS), -4),
+]
+_DATE_RES = [
+    re.compile(r'Dated\s*[:\s]*(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})', _FLAGS),
+    re.compile(r'Invoice Date\s*[:\s]*(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})', _FLAGS),
+    re.compile(r'Dt[:\s]*(\d{2}/\d{2}/\d{4})', _FLAGS),
+    re.compile(r'(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})', _FLAGS),
+]
+_INVOICE_DATE_IDX = 1
+_TOTAL_AMOUNT_RES = [
+    re.compile(r'BALANCE DUE\s*₹?\s*([0-9,]+(?:\.\d{2})?)', _FLAGS),
+    re.compile(r'Total Amount after Tax\s*₹?\s*([0-9,]+(?:\.\d{2})?)', _FLAGS),
+    re.compile(r'Total\s*₹?\s*([0-9,]+(?:\.\d{2})?)', _FLAGS),
+]
+_HEADER_DATE_TOKEN_RES = [re.compile(r'\b\d{1,2}-[A-Za-z]{3}-\d{2,4}\b'), re.compile(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b')]
+_LINE_NUMBER_RE = re.compile(r'^\d+\)?$')
+_NUMERIC_ONLY_RE = re.compile(r'[\d/.-]+')
+_PREPARED_BY_RE = re.compile(r'(?mi)^\s*Prepared\s*By\s*[:\-]\s*(.+)$')
+_FOR_RE = re.compile(r'(?mi)^\s*For\s+(.+?)\s*$')
+_STORE_CONTACT_RE = re.compile(r'(?mi)^.*\b(store\s*(?:contact|manager))\b.*$')
+_NUMBER_TOKEN_RE = re.compile(r'\d{1,3}(?:,\d{3})*(?:\.\d+)?|\d+(?:\.\d+)?')
+# Grand-total keywords; 'grand total' is left out as it always contains 'total'
+_TOTAL_LINE_KEYWORDS = ('total', 'amount chargeable', 'amount (inr)')
+_AMOUNT_RE = re.compile(r'₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)')
+_AMOUNT_BEFORE_TOTAL_RE = re.compile(r'₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)\s+total\b', re.IGNORECASE)
+_AMOUNT_AFTER_LABEL_RE = re.compile(
+    r'(grand\s+total|total\s*amount|total|amount\s*\(inr\))[:\s]*₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)\s*$',
+    re.IGNORECASE)
 
 def find_first_match(text, patterns):
     for p in patterns:
-        m = re.search(p, text, re.IGNORECASE | re.MULTILINE)
+        m = p.search(text) if isinstance(p, re.Pattern) else re.search(p, text, _FLAGS)
+        if m:
+            return m.group(1).strip()
+    return None
+
+def _first_match_at(pattern: re.Pattern, text: str, positions: List[int], offset: int = 0):
+    """Leftmost match of pattern among the candidate start positions (already in ascending order)."""
+    for pos in positions:
+        start = pos + offset
+        if start < 0:
+            continue
+        m = pattern.match(text, start)
+        if m:
+            return m
+    return None
+
+def _find_invoice_number(text: str, invoice_positions: List[int]) -> Optional[str]:
+    for pattern, offset in _INVOICE_NUMBER_RES:
+        m = _first_match_at(pattern, text, invoice_positions, offset)
+        if m:
+            return m.group(1).strip()
+    return None
+
+def _find_date(text: str, invoice_positions: List[int]) -> Optional[str]:
+    for i, pattern in enumerate(_DATE_RES):
+        m = _first_match_at(pattern, text, invoice_positions) if i == _INVOICE_DATE_IDX else pattern.search(text)
         if m:
             return m.group(1).strip()
     return None
 
 def get_invoice_sections(text):
     sections = {"header": text, "summary": text}
-    summary_match = re.search(r'(?i)^\s*(?:total|subtotal|amount chargeable|balance due)', text, re.MULTILINE)
+    summary_match = _SUMMARY_RE.search(text)
     if summary_match:
         sections["header"] = text[:summary_match.start()]
         sections["summary"] = text[summary_match.start():]
     return sections
 
+def extract_grand_total(full_text: str, doc: Optional[ParsedDocument] = None) -> Optional[float]:
+    doc = doc or ParsedDocument(full_text)
+    candidates: List[float] = []
+    for i in doc.lines_with(_TOTAL_LINE_KEYWORDS):
+        ln = doc.stripped[i]
+        if not ln:
+            continue
+        low = ln.lower()
+        for m in _AMOUNT_BEFORE_TOTAL_RE.finditer(low):
+            v = clean_amount(m.group(1))
+            if v is not None:
+                candidates.append(v)
+        m2 = _AMOUNT_AFTER_LABEL_RE.search(low)
+        if m2:
+            v = clean_amount(m2.group(2))
+            if v is not None:
+                candidates.append(v)
+        if 'total' in low:
+            for m in _AMOUNT_RE.finditer(ln):
+                v = clean_amount(m.group(1))
+                if v is not None:
+                    candidates.append(v)
+    if not candidates:
+        return None
+    gt = max(candidates)
+    if gt < 10 and len(candidates) > 1:
+        gt = max((c for c in candidates if c >= 10), default=gt)
+    return gt
+
 def process_invoice_regex(text):
-    invoice_number_patterns = [
-        r'Invoice\s*No\.?\s*[:#-]?\s*([A-Z0-9/-]{3,})',
-        r'Invoice\s*#\s*([A-Z0-9/-]{3,})',
-        r'Invoice\s*Number\s*[:#-]?\s*([A-Z0-9/-]{3,})',
-        r'Invoice Code\s*[:#-]?\s*([A-Z0-9/-]{3,})',
-        r'Tax Invoice#\s*([A-Z0-9/-]{3,})'
-    ]
-    date_patterns = [
-        r'Dated\s*[:\s]*(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})',
-        r'Invoice Date\s*[:\s]*(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})',
-        r'Dt[:\s]*(\d{2}/\d{2}/\d{4})',
-        r'(\d{1,2}[-/][A-Za-z]{3,}[-/]\d{2,4})'
-    ]
-    total_amount_patterns = [
-        r'BALANCE DUE\s*₹?\s*([0-9,]+(?:\.\d{2})?)',
-        r'Total Amount after Tax\s*₹?\s*([0-9,]+(?:\.\d{2})?)',
-        r'Total\s*₹?\s*([0-9,]+(?:\.\d{2})?)'
-    ]
-    sections = get_invoice_sections(text)
-    gstin_roles = extract_gstin_roles_and_vendor(text, sections['header'])
-    header_lines = [ln.strip() for ln in sections["header"].splitlines() if ln.strip()]
+    doc = ParsedDocument(text)
+    invoice_positions = doc.find_all('invoice')
+    gstin_roles = extract_gstin_roles_and_vendor(text, doc.header_text, doc)
+    header_lines = doc.header_lines
     vendor_candidates = []
     for ln in header_lines:
         low = ln.lower()
         if 'invoice' in low or 'gstin' in low or low.startswith('dated'):
             break
-        if re.match(r'^\d+\)?$', ln):
+        if _LINE_NUMBER_RE.match(ln):
             continue
         if len(ln) < 3:
             continue
@@ -53,7 +130,7 @@ def process_invoice_regex(text):
             vendor_candidates.append(ln)
     vendor_name = None
     if vendor_candidates:
-        vendor_candidates = [c for c in vendor_candidates if not re.fullmatch(r'[\d/.-]+', c)] or vendor_candidates
+        vendor_candidates = [c for c in vendor_candidates if not _NUMERIC_ONLY_RE.fullmatch(c)] or vendor_candidates
         vendor_name = max(vendor_candidates, key=len)[:120]
     if not vendor_name:
         vendor_name = header_lines[0].strip()[:120] if header_lines else None
@@ -64,31 +141,29 @@ def process_invoice_regex(text):
     def is_company_like(s: str) -> bool:
         return is_company_like_line(s)
     if not vendor_name or ('invoice' in (vendor_name or '').lower()):
-        m_prep = re.search(r'(?mi)^\s*Prepared\s*By\s*[:\-]\s*(.+)$', text)
+        m_prep = _PREPARED_BY_RE.search(text)
         if m_prep:
             candidate = m_prep.group(1).strip()
             if is_company_like(candidate):
                 vendor_name = candidate[:120]
         if not vendor_name:
-            m_for = re.search(r'(?mi)^\s*For\s+(.+?)\s*$', text)
+            m_for = _FOR_RE.search(text)
             if m_for:
                 cand = m_for.group(1).strip()
                 if is_company_like(cand):
                     vendor_name = cand[:120]
         if not vendor_name:
-            store_pat = re.compile(r'(?mi)^.*\b(store\s*(?:contact|manager))\b.*$')
-            lines = [ln for ln in text.splitlines()]
-            for i, ln in enumerate(lines):
-                if store_pat.search(ln):
+            for i, ln in enumerate(doc.lines):
+                if _STORE_CONTACT_RE.search(ln):
                     for j in range(max(0, i-6), i):
-                        cand = lines[j].strip()
+                        cand = doc.stripped[j]
                         if is_company_like(cand):
                             vendor_name = cand[:120]
                             break
                 if vendor_name:
                     break
         if not vendor_name or ('invoice' in vendor_name.lower()):
-            header_lines_scan = [ln.strip() for ln in sections['header'].splitlines()[:30] if ln.strip()]
+            header_lines_scan = [ln for ln in doc.stripped[:min(30, doc.header_line_count)] if ln]
             company_lines = [ln for ln in header_lines_scan if is_company_like(ln)]
             if company_lines:
                 vendor_name = max(company_lines, key=len)[:120]
@@ -96,43 +171,15 @@ def process_invoice_regex(text):
         vn_hint = gstin_roles.get('vendor_name_hint')
         if vn_hint and is_company_like_line(vn_hint):
             vendor_name = vn_hint
-    raw_date = find_first_match(text, date_patterns)
+    raw_date = _find_date(text, invoice_positions)
     if not raw_date:
-        token_match = re.search(r'\b\d{1,2}-[A-Za-z]{3}-\d{2,4}\b', sections["header"]) or re.search(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b', sections["header"]) 
+        token_match = _HEADER_DATE_TOKEN_RES[0].search(doc.header_text) or _HEADER_DATE_TOKEN_RES[1].search(doc.header_text)
         raw_date = token_match.group(0) if token_match else None
-    def extract_grand_total(full_text: str) -> Optional[float]:
-        candidates: List[float] = []
-        lines = [ln.strip() for ln in full_text.splitlines() if ln.strip()]
-        amount_re = re.compile(r'₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)')
-        for ln in lines:
-            low = ln.lower()
-            if not any(t in low for t in ['total', 'amount chargeable', 'grand total', 'amount (inr)']):
-                continue
-            for m in re.finditer(r'₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)\s+total\b', low, flags=re.IGNORECASE):
-                v = clean_amount(m.group(1))
-                if v is not None:
-                    candidates.append(v)
-            m2 = re.search(r'(grand\s+total|total\s*amount|total|amount\s*\(inr\))[:\s]*₹?\s*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{2})?)\s*$', low, flags=re.IGNORECASE)
-            if m2:
-                v = clean_amount(m2.group(2))
-                if v is not None:
-                    candidates.append(v)
-            if 'total' in low:
-                for m in amount_re.finditer(ln):
-                    v = clean_amount(m.group(1))
-                    if v is not None:
-                        candidates.append(v)
-        if not candidates:
-            return None
-        gt = max(candidates)
-        if gt < 10 and len(candidates) > 1:
-            gt = max((c for c in candidates if c >= 10), default=gt)
-        return gt
-    advanced_total = extract_grand_total(text)
-    basic_total = clean_amount(find_first_match(sections["summary"], total_amount_patterns))
+    advanced_total = extract_grand_total(text, doc)
+    basic_total = clean_amount(find_first_match(doc.summary_text, _TOTAL_AMOUNT_RES)) if advanced_total is None else None
     total_amount = advanced_total if advanced_total is not None else basic_total
     if total_amount is None:
-        all_tokens = re.findall(r'\d{1,3}(?:,\d{3})*(?:\.\d+)?|\d+(?:\.\d+)?', text)
+        all_tokens = _NUMBER_TOKEN_RE.findall(text)
         vals = []
         for tok in all_tokens:
             try:
@@ -143,7 +190,7 @@ def process_invoice_regex(text):
             guess = max(vals)
             if guess >= 100:
                 total_amount = guess
-    inv_raw = find_first_match(text, invoice_number_patterns)
+    inv_raw = _find_invoice_number(text, invoice_positions)
     inv_norm = normalize_invoice_number(inv_raw)
     data = {
         "vendor_name": vendor_name if is_company_like_line(vendor_name or '') else None,
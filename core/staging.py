@@ -0,0 +1,54 @@
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from .config import INVOICE_HISTORY
+from database import save_to_db
+
+_HISTORY_FIELDS = ('vendor_name', 'invoice_number', 'invoice_date', 'total_amount', 'vendor_gstin',
+                   'customer_gstin', 'processing_tier', 'status', 'skipped_tier', 'llm_cache', 'llm_chars_saved')
+
+class ResultStage:
+    """Collects one invoice's pipeline run in memory: every tier's output and timing, and the result
+    to keep. commit() writes that result once, with the tier outputs as invoice_history rows in the
+    same transaction when INVOICE_HISTORY is on, so pollers never see intermediate results."""
+
+    def __init__(self, file_path: str, content_hash: Optional[str] = None, history: bool = INVOICE_HISTORY):
+        self.file_path = file_path
+        self.content_hash = content_hash
+        self.history = history
+        self.result: Optional[Dict[str, Any]] = None
+        self.tiers: List[Dict[str, Any]] = []
+        self._started: Dict[str, float] = {}
+
+    def begin(self, tier: str):
+        self._started[tier] = time.perf_counter()
+
+    def end(self, tier: str, output: Optional[Dict[str, Any]]):
+        t0 = self._started.pop(tier, None)
+        self._record(tier, 'finished', time.perf_counter() - t0 if t0 is not None else None, output)
+
+    def skip(self, tier: str):
+        self._record(tier, 'skipped', None, None)
+
+    def _record(self, tier: str, event: str, seconds: Optional[float], output: Optional[Dict[str, Any]]):
+        fields = {k: output.get(k) for k in _HISTORY_FIELDS if output.get(k) is not None} if output else None
+        self.tiers.append({'tier': tier, 'event': event, 'seconds': seconds, 'output': fields,
+                           'at': datetime.now(timezone.utc).isoformat()})
+
+    def stage(self, result: Dict[str, Any]):
+        """Make result the one commit() writes, replacing anything staged before"""
+        self.result = result
+
+    def commit(self, db_name: str = "invoices.db"):
+        if self.result is None:
+            return
+        if self.content_hash:
+            self.result['content_hash'] = self.content_hash
+        history = None
+        if self.history:
+            history = [{'file_path': self.file_path, 'tier': t['tier'], 'event': t['event'], 'seconds': t['seconds'],
+                        'output': json.dumps(t['output']) if t['output'] is not None else None,
+                        'created_at': t['at']} for t in self.tiers]
+        save_to_db(self.result, db_name, history=history)
+        self.result = None
@@ -1,6 +1,12 @@
+import hashlib
 import re
 from typing import Optional, List
-from dateutil.parser import parse
+from .dates import normalize_date
+from .keywords import CATEGORIES, keyword_hits, keyword_set
+
+_COMPANY_LINE_REJECT = (keyword_set('invoice', 'gstin', 'bill to', 'ship to', 'address', 'tax invoice', 'order no',
+                                    'invoice code', 'ref.', 'ref ', 'ref:')
+                        | CATEGORIES['contact'] | CATEGORIES['address'] | CATEGORIES['locality'])
 
 def clean_amount(s):
     if s is None:
@@ -24,13 +30,7 @@ def clean_amount(s):
 def parse_date_str(s):
     if not s:
         return None
-    s = str(s).strip()
-    if re.fullmatch(r'20\d{2}-\d{2}', s):
-        return None
-    try:
-        return parse(s, fuzzy=True).date().isoformat()
-    except Exception:
-        return None
+    return normalize_date(str(s))
 
 def alnum_mix(s: Optional[str]) -> bool:
     if not isinstance(s, str):
@@ -42,18 +42,13 @@ def is_company_like_line(s: str) -> bool:
     if not s or len(s) < 3:
         return False
     low = s.lower()
-    bad = ['invoice', 'gstin', 'bill to', 'ship to', 'address', 'tax invoice', 'order no', 'invoice code', 'ref.', 'ref ', 'ref:',
-           'contact', 'phone', 'mobile', 'email', 'www', 'website', 'store', 'helpline', 'care', 'customer',
-           'road', 'rd', 'street', 'st ', 'st.', 'lane', 'ln', 'complex', 'tower', 'floor', 'opp', 'near', 'shop', 'block',
-           'sector', 'phase', 'plot', 'no.', 'no ', 'colony', 'market', 'apartment', 'residency', 'residence', 'society',
-           'village', 'taluka', 'tehsil', 'district', 'dist', 'po ', 'ps ', 'pin', 'pincode', 'zip', 'city', 'state']
-    if any(b in low for b in bad):
+    hits = keyword_hits(low)
+    if hits & _COMPANY_LINE_REJECT:
         return False
     letters = sum(c.isalpha() for c in s)
     if letters < 3:
         return False
-    suffixes = ['private limited', 'pvt', 'pvt.', 'pvt ltd', 'ltd', 'llp', 'inc', 'co', 'company', 'limited']
-    if any(sf in low for sf in suffixes):
+    if hits & CATEGORIES['company_suffix']:
         return True
     compact = re.sub(r'\s+', '', s)
     upper_ratio = sum(1 for c in compact if c.isupper()) / max(1, len(compact))
@@ -81,3 +76,10 @@ def has_any_field(d: dict) -> bool:
         return False
     keys = ["vendor_name", "total_amount", "invoice_number", "invoice_date"]
     return any(d.get(k) not in (None, "") for k in keys)
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,49 @@
+import threading
+import time
+from typing import Dict, Optional
+from .config import VENDOR_MASTER_REFRESH_SECONDS
+from database import load_vendor_master
+
+class VendorMaster:
+    """In-memory GSTIN -> canonical vendor name map backed by the vendor_master table. invalidate()
+    drops it after a verification in this process; other processes (job or batch workers) pick up
+    changes when their copy is older than refresh_seconds."""
+
+    def __init__(self, refresh_seconds: float = VENDOR_MASTER_REFRESH_SECONDS, db_name: str = "invoices.db"):
+        self.refresh_seconds = refresh_seconds
+        self.db_name = db_name
+        self._names: Optional[Dict[str, str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _current(self) -> Dict[str, str]:
+        with self._lock:
+            if self._names is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+                try:
+                    self._names = load_vendor_master(self.db_name)
+                except Exception as e:
+                    print(f"Could not load vendor master: {e}")
+                    self._names = {}
+                self._loaded_at = time.monotonic()
+            return self._names
+
+    def lookup(self, vendor_gstin: Optional[str]) -> Optional[str]:
+        if not vendor_gstin:
+            return None
+        return self._current().get(vendor_gstin.strip().upper().replace(' ', ''))
+
+    def record_hit(self):
+        """Count an invoice whose vendor name came from the master"""
+        with self._lock:
+            self.hits += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._names = None
+
+    def stats(self):
+        with self._lock:
+            return {'vendors': len(self._names) if self._names is not None else None, 'hits': self.hits}
+
+vendor_master = VendorMaster()
@@ -1,8 +1,50 @@
+import atexit
+import json
+import os
+import queue
 import sqlite3
-from typing import Dict, Any
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from core.duplicates import duplicate_key
+from core.config import (DB_SYNCHRONOUS, DB_BUSY_TIMEOUT, DB_WRITE_BEHIND, DB_WRITE_BATCH_MAX, DB_WRITE_BATCH_WAIT,
+                         GSTIN_REGEX)
+
+_local = threading.local()
+_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+_INVOICE_INDEX_COLUMNS = ('filename', 'status', 'processing_tier', 'verified', 'extracted_at', 'content_hash',
+                          'dup_key', 'duplicate_of')
+
+def get_connection(db_name: str = "invoices.db") -> sqlite3.Connection:
+    """This thread's connection to db_name, opened once in WAL mode with rows returned as sqlite3.Row.
+    Connections are not shared across threads or inherited across fork."""
+    conns = getattr(_local, 'conns', None)
+    if conns is None or getattr(_local, 'pid', None) != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(db_name)
+    if conn is None:
+        conn = sqlite3.connect(db_name, timeout=DB_BUSY_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS if DB_SYNCHRONOUS in _SYNCHRONOUS_MODES else 'NORMAL'}")
+        conns[db_name] = conn
+    return conn
+
+def close_connections():
+    """Close this thread's connections. Called when a request ends, since the development server
+    serves each request on a new thread and a connection left open there would never be reused."""
+    for conn in getattr(_local, 'conns', {}).values():
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Could not close database connection: {e}")
+    _local.conns = {}
 
 def setup_database(db_name: str = "invoices.db"):
-    conn = sqlite3.connect(db_name)
+    conn = get_connection(db_name)
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -19,7 +61,13 @@ def setup_database(db_name: str = "invoices.db"):
             status TEXT,
             extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             filename TEXT,
-            verified BOOLEAN DEFAULT FALSE
+            verified BOOLEAN DEFAULT FALSE,
+            skipped_tier TEXT,
+            content_hash TEXT,
+            dup_key TEXT,
+            duplicate_of INTEGER,
+            llm_cache TEXT,
+            llm_chars_saved INTEGER
         )
         """
     )
@@ -30,7 +78,13 @@ def setup_database(db_name: str = "invoices.db"):
         "invoice_number": "ALTER TABLE invoices ADD COLUMN invoice_number TEXT",
         "vendor_gstin": "ALTER TABLE invoices ADD COLUMN vendor_gstin TEXT",
         "customer_gstin": "ALTER TABLE invoices ADD COLUMN customer_gstin TEXT",
-        "verified": "ALTER TABLE invoices ADD COLUMN verified BOOLEAN DEFAULT FALSE"
+        "verified": "ALTER TABLE invoices ADD COLUMN verified BOOLEAN DEFAULT FALSE",
+        "skipped_tier": "ALTER TABLE invoices ADD COLUMN skipped_tier TEXT",
+        "content_hash": "ALTER TABLE invoices ADD COLUMN content_hash TEXT",
+        "dup_key": "ALTER TABLE invoices ADD COLUMN dup_key TEXT",
+        "duplicate_of": "ALTER TABLE invoices ADD COLUMN duplicate_of INTEGER",
+        "llm_cache": "ALTER TABLE invoices ADD COLUMN llm_cache TEXT",
+        "llm_chars_saved": "ALTER TABLE invoices ADD COLUMN llm_chars_saved INTEGER"
     }
     for col, stmt in wanted.items():
         if col not in existing_cols:
@@ -39,83 +93,575 @@ def setup_database(db_name: str = "invoices.db"):
                 print(f"Added missing column: {col}")
             except Exception as e:
                 print(f"Could not add column {col}: {e}")
+    # Secondary indexes also hold the rowid (id), so a filter on one column can walk its index in id
+    # order, which is what the keyset-paginated listing needs
+    for col in _INVOICE_INDEX_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_invoices_{col} ON invoices({col})")
+    _backfill_dup_keys(conn)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            file_path TEXT,
+            filename TEXT,
+            state TEXT,
+            error TEXT,
+            tiers TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_filename ON jobs(filename, created_at)")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS invoice_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT,
+            tier TEXT,
+            event TEXT,
+            seconds REAL,
+            output TEXT,
+            created_at TEXT
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_history_file_path ON invoice_history(file_path)")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vendor_master (
+            vendor_gstin TEXT PRIMARY KEY,
+            vendor_name TEXT,
+            verified_count INTEGER,
+            updated_at TEXT
+        )
+        """
+    )
+    if cursor.execute("SELECT COUNT(*) FROM vendor_master").fetchone()[0] == 0:
+        # first run: seed from invoices verified before the table existed (latest name per GSTIN)
+        for row in cursor.execute(
+                "SELECT vendor_gstin, vendor_name FROM invoices WHERE verified AND vendor_gstin IS NOT NULL ORDER BY id"
+        ).fetchall():
+            _remember_vendor(cursor, row[0], row[1])
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS document_texts (
+            content_hash TEXT,
+            extractor TEXT,
+            extractor_version TEXT,
+            text BLOB,
+            chars INTEGER,
+            created_at TEXT,
+            PRIMARY KEY (content_hash, extractor, extractor_version)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT,
+            prompt_version TEXT,
+            response BLOB,
+            bytes INTEGER,
+            created_at REAL,
+            last_used REAL
+        )
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
     conn.commit()
-    conn.close()
     print("Database setup / migration complete.")
 
-def save_to_db(data: Dict[str, Any], db_name: str = "invoices.db"):
+def _backfill_dup_keys(conn: sqlite3.Connection, batch: int = 5000):
+    """Fill dup_key for invoices stored before duplicate detection existed, so new uploads are matched
+    against them too. Works through the rows with all four key fields in id order, batch at a time."""
+    last_id, filled = 0, 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT id, vendor_gstin, invoice_number, invoice_date, total_amount FROM invoices
+            WHERE dup_key IS NULL AND id > ? AND vendor_gstin IS NOT NULL AND invoice_number IS NOT NULL
+                AND invoice_date IS NOT NULL AND total_amount IS NOT NULL
+            ORDER BY id LIMIT ?
+            """, (last_id, batch)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for row in rows:
+            key = duplicate_key(dict(row))
+            if key:
+                updates.append((key, row[0]))
+        with conn:
+            conn.executemany("UPDATE invoices SET dup_key=? WHERE id=?", updates)
+        filled += len(updates)
+    if filled:
+        print(f"Backfilled duplicate keys for {filled} invoices")
+
+_UPSERT_INVOICE_SQL = """
+    INSERT INTO invoices (file_path, vendor_name, invoice_number, invoice_date, total_amount, vendor_gstin, customer_gstin, processing_tier, status, filename, skipped_tier, content_hash, dup_key, duplicate_of, llm_cache, llm_chars_saved)
+    VALUES (:file_path, :vendor_name, :invoice_number, :invoice_date, :total_amount, :vendor_gstin, :customer_gstin, :processing_tier, :status, :filename, :skipped_tier, :content_hash, :dup_key, :duplicate_of, :llm_cache, :llm_chars_saved)
+    ON CONFLICT(file_path) DO UPDATE SET
+        vendor_name=excluded.vendor_name,
+        invoice_number=excluded.invoice_number,
+        invoice_date=excluded.invoice_date,
+        total_amount=excluded.total_amount,
+        vendor_gstin=excluded.vendor_gstin,
+        customer_gstin=excluded.customer_gstin,
+        processing_tier=excluded.processing_tier,
+        status=excluded.status,
+        filename=excluded.filename,
+        skipped_tier=excluded.skipped_tier,
+        content_hash=COALESCE(excluded.content_hash, invoices.content_hash),
+        dup_key=excluded.dup_key,
+        duplicate_of=excluded.duplicate_of,
+        llm_cache=excluded.llm_cache,
+        llm_chars_saved=excluded.llm_chars_saved
+"""
+
+def _invoice_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    file_path = data.get("file_path")
+    return {
+        "file_path": file_path,
+        "vendor_name": data.get("vendor_name"),
+        "invoice_number": data.get("invoice_number"),
+        "invoice_date": data.get("invoice_date"),
+        "total_amount": data.get("total_amount"),
+        "vendor_gstin": data.get("vendor_gstin"),
+        "customer_gstin": data.get("customer_gstin"),
+        "processing_tier": data.get("processing_tier"),
+        "status": data.get("status", "SUCCESS"),
+        "filename": file_path.split('/')[-1] if file_path else None,
+        "skipped_tier": data.get("skipped_tier"),
+        "content_hash": data.get("content_hash"),
+        "dup_key": duplicate_key(data),
+        "duplicate_of": data.get("duplicate_of"),
+        "llm_cache": data.get("llm_cache"),
+        "llm_chars_saved": data.get("llm_chars_saved")
+    }
+
+_INSERT_HISTORY_SQL = """
+    INSERT INTO invoice_history (file_path, tier, event, seconds, output, created_at)
+    VALUES (:file_path, :tier, :event, :seconds, :output, :created_at)
+"""
+
+def _write_invoices(db_name: str, rows: List[Dict[str, Any]], history: Optional[List[Dict[str, Any]]] = None):
+    """Upsert invoice rows and append their tier history rows in one transaction"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.executemany(_UPSERT_INVOICE_SQL, rows)
+        if history:
+            conn.executemany(_INSERT_HISTORY_SQL, history)
+    for row in rows:
+        print(f"Saved to DB ({row['processing_tier']}): {row['filename']}")
+
+class WriteBehindError(Exception):
+    """Queued invoice writes that could not be committed, raised by flush_writes() in the thread that
+    queued them. failures maps each lost file_path to its error."""
+
+    def __init__(self, failures: Dict[str, str]):
+        super().__init__("; ".join(f"could not save {path}: {error}" for path, error in failures.items()))
+        self.failures = failures
+
+class WriteBehindWriter:
+    """Single background thread that applies invoice upserts in batched transactions. Whatever is
+    queued within batch_wait seconds of the first write (up to batch_max rows) is committed together,
+    and repeated upserts of the same file_path collapse into the last one (history rows are all kept).
+    A batch that fails is retried row by row; rows that still fail are reported to the submitting
+    thread by its next flush()."""
+
+    def __init__(self, batch_max: int = DB_WRITE_BATCH_MAX, batch_wait: float = DB_WRITE_BATCH_WAIT):
+        self.batch_max = max(1, batch_max)
+        self.batch_wait = batch_wait
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._failures: Dict[int, Dict[str, str]] = {}  # submitting thread -> file_path -> error
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_coalesced = 0
+        self.rows_failed = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # a forked child gets the queue but not the thread, so start afresh
+                self._queue = queue.Queue()
+                self._failures = {}
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, db_name: str, row: Dict[str, Any], history: Optional[List[Dict[str, Any]]] = None):
+        self._ensure_thread()
+        self._queue.put(('row', (db_name, row, history or [], threading.get_ident())))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted before this call is committed. False on timeout. Raises
+        WriteBehindError if rows this thread submitted could not be written."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        finished = done.wait(timeout)
+        with self._lock:
+            failures = self._failures.pop(threading.get_ident(), None)
+        if failures:
+            raise WriteBehindError(failures)
+        return finished
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, Dict[str, Any], List[Dict[str, Any]], int]], List[threading.Event]]:
+        rows, flushes = [], []
+        kind, item = self._queue.get()
+        deadline = time.monotonic() + self.batch_wait
+        while True:
+            if kind == 'flush':
+                flushes.append(item)
+                # a flush is waiting, so commit what we have now
+                deadline = 0
+            else:
+                rows.append(item)
+            if len(rows) >= self.batch_max:
+                break
+            try:
+                remaining = deadline - time.monotonic()
+                kind, item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return rows, flushes
+
+    def _run(self):
+        while True:
+            rows, flushes = self._next_batch()
+            by_db: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            history: Dict[str, List[Dict[str, Any]]] = {}
+            owners: Dict[Tuple[str, str], set] = {}
+            for db_name, row, row_history, owner in rows:
+                by_db.setdefault(db_name, {})[row['file_path']] = row
+                history.setdefault(db_name, []).extend(row_history)
+                owners.setdefault((db_name, row['file_path']), set()).add(owner)
+            for db_name, latest in by_db.items():
+                self._write(db_name, latest, history[db_name], owners)
+            with self._lock:
+                self.rows_coalesced += len(rows) - sum(len(v) for v in by_db.values())
+            for done in flushes:
+                done.set()
+
+    def _write(self, db_name: str, latest: Dict[str, Dict[str, Any]], history: List[Dict[str, Any]],
+               owners: Dict[Tuple[str, str], set]):
+        try:
+            _write_invoices(db_name, list(latest.values()), history)
+            with self._lock:
+                self.batches += 1
+                self.rows_written += len(latest)
+            return
+        except Exception as e:
+            print(f"Write-behind batch of {len(latest)} rows failed, retrying row by row: {e}")
+        for file_path, row in latest.items():
+            try:
+                _write_invoices(db_name, [row], [h for h in history if h.get('file_path') == file_path])
+                with self._lock:
+                    self.rows_written += 1
+            except Exception as e:
+                print(f"Could not save {file_path}: {e}")
+                with self._lock:
+                    self.rows_failed += 1
+                    for owner in owners[(db_name, file_path)]:
+                        self._failures.setdefault(owner, {})[file_path] = str(e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'pending': self._queue.qsize(), 'batches': self.batches, 'rows_written': self.rows_written,
+                    'rows_coalesced': self.rows_coalesced, 'rows_failed': self.rows_failed}
+
+writer = WriteBehindWriter()
+
+def _flush_at_exit():
+    try:
+        writer.flush(10)
+    except WriteBehindError as e:
+        print(f"Unsaved invoice writes at exit: {e}")
+
+atexit.register(_flush_at_exit)
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    """Wait for queued invoice writes to be committed (before reading them back, in tests, at shutdown).
+    Raises WriteBehindError for rows queued by this thread that could not be saved."""
+    return writer.flush(timeout)
+
+def save_to_db(data: Dict[str, Any], db_name: str = "invoices.db", history: Optional[List[Dict[str, Any]]] = None):
+    """Upsert an invoice result keyed by file_path, together with optional invoice_history rows
+    (file_path, tier, event, seconds, output, created_at). With DB_WRITE_BEHIND the write is queued for
+    the background writer; call flush_writes() before reading it back."""
     if not data.get("file_path"):
         print("Cannot save record without file_path")
         return
-    file_path = data.get("file_path")
-    filename = file_path.split('/')[-1] if file_path else None
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
+    row = _invoice_params(data)
+    if DB_WRITE_BEHIND:
+        writer.submit(db_name, row, history)
+    else:
+        _write_invoices(db_name, [row], history)
+
+def get_result_by_filename(filename: str, db_name: str = "invoices.db"):
+    conn = get_connection(db_name)
+    result = conn.execute("SELECT * FROM invoices WHERE filename = ?", (filename,)).fetchone()
+    return dict(result) if result else None
+
+def list_results(filters: Dict[str, Any], limit: int = 50, before_id: Optional[int] = None,
+                 db_name: str = "invoices.db") -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """A page of invoice rows, newest first, and the cursor for the next page (None on the last one).
+    filters may hold status, processing_tier, verified (bool), vendor_gstin and an extracted_at range
+    (since/until). Pages are keyed on id rather than OFFSET, so deep pages cost the same as the first."""
+    clauses, params = [], []
+    for col in ('status', 'processing_tier', 'vendor_gstin'):
+        if filters.get(col) is not None:
+            clauses.append(f"{col} = ?")
+            params.append(filters[col])
+    if filters.get('verified') is not None:
+        clauses.append("verified = ?")
+        params.append(1 if filters['verified'] else 0)
+    if filters.get('since'):
+        clauses.append("extracted_at >= ?")
+        params.append(filters['since'])
+    if filters.get('until'):
+        clauses.append("extracted_at < ?")
+        params.append(filters['until'])
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = get_connection(db_name).execute(
+        f"SELECT * FROM invoices {where} ORDER BY id DESC LIMIT ?", (*params, limit + 1)
+    ).fetchall()
+    page = [dict(r) for r in rows[:limit]]
+    next_cursor = page[-1]['id'] if len(rows) > limit else None
+    return page, next_cursor
+
+def find_result_by_content_hash(content_hash: str, db_name: str = "invoices.db") -> Optional[Dict[str, Any]]:
+    """The best finished result for byte-identical content: a verified row if there is one, else the
+    latest. Failed results are not reused."""
+    row = get_connection(db_name).execute(
+        "SELECT * FROM invoices WHERE content_hash = ? AND status != 'FAILED' ORDER BY verified DESC, id DESC LIMIT 1",
+        (content_hash,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def link_result(source: Dict[str, Any], file_path: str, db_name: str = "invoices.db") -> Dict[str, Any]:
+    """Record source's result (verified corrections and flag included) for another file with the same
+    content, marked as a duplicate of source (or of the invoice source itself duplicates), written
+    synchronously so it can be returned right away"""
+    conn = get_connection(db_name)
+    if file_path == source.get('file_path'):
+        # the same file uploaded again under its own name
+        return dict(source)
+    data = dict(source, file_path=file_path, status='DUPLICATE',
+                duplicate_of=source.get('duplicate_of') or source.get('id'))
+    with conn:
+        conn.execute(_UPSERT_INVOICE_SQL, _invoice_params(data))
+        conn.execute("UPDATE invoices SET verified=? WHERE file_path=?", (source.get('verified') or 0, file_path))
+    return dict(conn.execute("SELECT * FROM invoices WHERE file_path=?", (file_path,)).fetchone())
+
+def find_duplicate(dup_key: str, file_path: str, db_name: str = "invoices.db") -> Optional[Dict[str, Any]]:
+    """The earliest other invoice with this duplicate key that is not itself marked a duplicate"""
+    row = get_connection(db_name).execute(
+        "SELECT * FROM invoices WHERE dup_key = ? AND file_path != ? AND duplicate_of IS NULL ORDER BY id LIMIT 1",
+        (dup_key, file_path)
+    ).fetchone()
+    return dict(row) if row else None
+
+def list_duplicate_clusters(limit: int = 50, before_id: Optional[int] = None,
+                            db_name: str = "invoices.db") -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Invoices that have duplicates, newest original first, each with its duplicate rows, and the
+    cursor for the next page"""
+    conn = get_connection(db_name)
+    where = "WHERE duplicate_of < ?" if before_id is not None else "WHERE duplicate_of IS NOT NULL"
+    params = (before_id,) if before_id is not None else ()
+    ids = [r[0] for r in conn.execute(
+        f"SELECT DISTINCT duplicate_of FROM invoices {where} ORDER BY duplicate_of DESC LIMIT ?", (*params, limit + 1)
+    ).fetchall()]
+    clusters = []
+    for original_id in ids[:limit]:
+        original = conn.execute("SELECT * FROM invoices WHERE id = ?", (original_id,)).fetchone()
+        duplicates = conn.execute("SELECT * FROM invoices WHERE duplicate_of = ? ORDER BY id", (original_id,)).fetchall()
+        clusters.append({'original': dict(original) if original else {'id': original_id},
+                         'duplicates': [dict(r) for r in duplicates]})
+    next_cursor = ids[limit - 1] if len(ids) > limit else None
+    return clusters, next_cursor
+
+def _remember_vendor(cursor, vendor_gstin: Optional[str], vendor_name: Optional[str]) -> bool:
+    """Record a verified GSTIN -> vendor name pair in vendor_master (the latest verification wins)"""
+    gstin = (vendor_gstin or '').strip().upper().replace(' ', '')
+    name = (vendor_name or '').strip()
+    if not name or not GSTIN_REGEX.match(gstin):
+        return False
     cursor.execute(
         """
-        INSERT INTO invoices (file_path, vendor_name, invoice_number, invoice_date, total_amount, vendor_gstin, customer_gstin, processing_tier, status, filename)
-        VALUES (:file_path, :vendor_name, :invoice_number, :invoice_date, :total_amount, :vendor_gstin, :customer_gstin, :processing_tier, :status, :filename)
-        ON CONFLICT(file_path) DO UPDATE SET
+        INSERT INTO vendor_master (vendor_gstin, vendor_name, verified_count, updated_at) VALUES (?, ?, 1, ?)
+        ON CONFLICT(vendor_gstin) DO UPDATE SET
             vendor_name=excluded.vendor_name,
-            invoice_number=excluded.invoice_number,
-            invoice_date=excluded.invoice_date,
-            total_amount=excluded.total_amount,
-            vendor_gstin=excluded.vendor_gstin,
-            customer_gstin=excluded.customer_gstin,
-            processing_tier=excluded.processing_tier,
-            status=excluded.status,
-            filename=excluded.filename
+            verified_count=vendor_master.verified_count + 1,
+            updated_at=excluded.updated_at
         """,
-        {
-            "file_path": data.get("file_path"),
-            "vendor_name": data.get("vendor_name"),
-            "invoice_number": data.get("invoice_number"),
-            "invoice_date": data.get("invoice_date"),
-            "total_amount": data.get("total_amount"),
-            "vendor_gstin": data.get("vendor_gstin"),
-            "customer_gstin": data.get("customer_gstin"),
-            "processing_tier": data.get("processing_tier"),
-            "status": data.get("status", "SUCCESS"),
-            "filename": filename
-        }
+        (gstin, name, _now())
     )
-    conn.commit()
-    conn.close()
-    print(f"Saved to DB ({data.get('processing_tier')}): {filename}")
+    return True
 
-def get_result_by_filename(filename: str, db_name: str = "invoices.db"):
-    conn = sqlite3.connect(db_name)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM invoices WHERE filename = ?", (filename,))
-    result = cursor.fetchone()
-    conn.close()
-    return dict(result) if result else None
+def load_vendor_master(db_name: str = "invoices.db") -> Dict[str, str]:
+    return {row[0]: row[1] for row in
+            get_connection(db_name).execute("SELECT vendor_gstin, vendor_name FROM vendor_master").fetchall()}
 
-def upsert_verified_data(filename: str, verified_data: Dict[str, Any], db_name: str = "invoices.db"):
-    """Update invoice data with verified information and mark as verified"""
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    
-    # Update the record with verified data
-    cursor.execute(
+def upsert_verified_data(filename: str, verified_data: Dict[str, Any], db_name: str = "invoices.db") -> bool:
+    """Update invoice data with verified information and mark as verified. The verified GSTIN and
+    vendor name also go into vendor_master; returns True if that table changed."""
+    # apply any queued pipeline write first so it cannot overwrite the verified values
+    flush_writes()
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            """
+            UPDATE invoices 
+            SET vendor_name=?, invoice_number=?, invoice_date=?, total_amount=?, 
+                vendor_gstin=?, customer_gstin=?, dup_key=?, verified=TRUE
+            WHERE filename=?
+            """,
+            (
+                verified_data.get("vendor_name"),
+                verified_data.get("invoice_number"),
+                verified_data.get("invoice_date"),
+                verified_data.get("total_amount"),
+                verified_data.get("vendor_gstin"),
+                verified_data.get("customer_gstin"),
+                duplicate_key(verified_data),
+                filename
+            )
+        )
+        vendor_changed = _remember_vendor(conn, verified_data.get("vendor_gstin"), verified_data.get("vendor_name"))
+    print(f"Updated verified data for: {filename}")
+    return vendor_changed
+
+def get_invoice_history(filename: str, db_name: str = "invoices.db") -> List[Dict[str, Any]]:
+    """Tier outputs recorded for a file (INVOICE_HISTORY), oldest first"""
+    rows = get_connection(db_name).execute(
         """
-        UPDATE invoices 
-        SET vendor_name=?, invoice_number=?, invoice_date=?, total_amount=?, 
-            vendor_gstin=?, customer_gstin=?, verified=TRUE
-        WHERE filename=?
-        """,
-        (
-            verified_data.get("vendor_name"),
-            verified_data.get("invoice_number"),
-            verified_data.get("invoice_date"),
-            verified_data.get("total_amount"),
-            verified_data.get("vendor_gstin"),
-            verified_data.get("customer_gstin"),
-            filename
+        SELECT h.* FROM invoice_history h JOIN invoices i ON i.file_path = h.file_path
+        WHERE i.filename = ? ORDER BY h.id
+        """, (filename,)
+    ).fetchall()
+    history = []
+    for row in rows:
+        entry = dict(row)
+        entry['output'] = json.loads(entry['output']) if entry['output'] else None
+        history.append(entry)
+    return history
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _job_row_to_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    job['tiers'] = json.loads(job['tiers']) if job.get('tiers') else {}
+    return job
+
+def create_job(job_id: str, file_path: str, db_name: str = "invoices.db"):
+    filename = file_path.split('/')[-1]
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT INTO jobs (id, file_path, filename, state, tiers, created_at) VALUES (?, ?, ?, 'queued', '{}', ?)",
+            (job_id, file_path, filename, _now())
         )
-    )
-    
-    conn.commit()
-    conn.close()
-    print(f"Updated verified data for: {filename}")
\ No newline at end of file
+
+def update_job_state(job_id: str, state: str, error: Optional[str] = None, db_name: str = "invoices.db"):
+    """Move a job to queued/running/done/failed, stamping start and finish times"""
+    conn = get_connection(db_name)
+    with conn:
+        if state == 'running':
+            conn.execute("UPDATE jobs SET state=?, started_at=? WHERE id=?", (state, _now(), job_id))
+        elif state in ('done', 'failed'):
+            conn.execute("UPDATE jobs SET state=?, error=?, finished_at=? WHERE id=?", (state, error, _now(), job_id))
+        else:
+            conn.execute("UPDATE jobs SET state=? WHERE id=?", (state, job_id))
+
+def record_job_tier(job_id: str, tier: str, event: str, db_name: str = "invoices.db"):
+    """Record a per-tier timestamp (event is 'started', 'finished' or 'skipped') for a job"""
+    conn = get_connection(db_name)
+    with conn:
+        row = conn.execute("SELECT tiers FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is not None:
+            tiers = json.loads(row[0]) if row[0] else {}
+            tiers.setdefault(tier, {})[f"{event}_at"] = _now()
+            conn.execute("UPDATE jobs SET tiers=? WHERE id=?", (json.dumps(tiers), job_id))
+
+def get_job(job_id: str, db_name: str = "invoices.db"):
+    row = get_connection(db_name).execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _job_row_to_dict(row) if row else None
+
+def get_latest_job_by_filename(filename: str, db_name: str = "invoices.db"):
+    row = get_connection(db_name).execute(
+        "SELECT * FROM jobs WHERE filename=? ORDER BY created_at DESC LIMIT 1", (filename,)
+    ).fetchone()
+    return _job_row_to_dict(row) if row else None
+
+def save_document_text(content_hash: str, extractor: str, extractor_version: str, text: str, db_name: str = "invoices.db"):
+    """Store an extracted text layer (zlib-compressed) for a document's content hash"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO document_texts (content_hash, extractor, extractor_version, text, chars, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (content_hash, extractor, extractor_version, zlib.compress(text.encode('utf-8')), len(text), _now())
+        )
+
+def load_document_text(content_hash: str, extractor: str, extractor_version: str, db_name: str = "invoices.db") -> Optional[str]:
+    row = get_connection(db_name).execute(
+        "SELECT text FROM document_texts WHERE content_hash=? AND extractor=? AND extractor_version=?",
+        (content_hash, extractor, extractor_version)
+    ).fetchone()
+    return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+def load_llm_response(cache_key: str, max_age_seconds: float, db_name: str = "invoices.db") -> Optional[str]:
+    """Cached LLM response content, or None if missing or older than max_age_seconds (expired rows are
+    dropped on the way)"""
+    now = time.time()
+    conn = get_connection(db_name)
+    with conn:
+        row = conn.execute("SELECT response, created_at FROM llm_cache WHERE cache_key=?", (cache_key,)).fetchone()
+        if row and now - row[1] > max_age_seconds:
+            conn.execute("DELETE FROM llm_cache WHERE cache_key=?", (cache_key,))
+            row = None
+        elif row:
+            conn.execute("UPDATE llm_cache SET last_used=? WHERE cache_key=?", (now, cache_key))
+    return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+def save_llm_response(cache_key: str, model: str, prompt_version: str, content: str, max_bytes: int,
+                      db_name: str = "invoices.db") -> int:
+    """Store an LLM response (zlib-compressed), then evict least recently used rows until the table fits
+    in max_bytes. Returns the number of rows evicted."""
+    now = time.time()
+    blob = zlib.compress(content.encode('utf-8'))
+    evicted = 0
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO llm_cache (cache_key, model, prompt_version, response, bytes, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (cache_key, model, prompt_version, blob, len(blob), now, now)
+        )
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM llm_cache").fetchone()[0]
+        if total > max_bytes:
+            for key, size in conn.execute(
+                    "SELECT cache_key, bytes FROM llm_cache WHERE cache_key != ? ORDER BY last_used", (cache_key,)).fetchall():
+                if total <= max_bytes:
+                    break
+                conn.execute("DELETE FROM llm_cache WHERE cache_key=?", (key,))
+                total -= size
+                evicted += 1
+    return evicted
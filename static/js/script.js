@@ -149,7 +149,7 @@ async function handleFileUpload(e) {
 }
 
 function startPolling(resultsUrl) {
-    const maxAttempts = 10;
+    const maxAttempts = 100;
     const intervalMs = 3000;
     let attempts = 0;
     hideError();
@@ -159,11 +159,17 @@ function startPolling(resultsUrl) {
         console.log('Polling attempt', attempts);
         try {
             const resp = await fetch(resultsUrl, { cache: 'no-store' });
+            const data = await resp.json();
             if (resp.status === 200) {
-                const data = await resp.json();
                 displayResults(data);
                 return;
             }
+            if (resp.status === 202 && data.job) {
+                console.log('Job state:', data.job.state, data.job.tiers);
+            } else if (resp.status !== 404) {
+                showError(data.error || 'Error processing file');
+                return;
+            }
         } catch (e) {
             console.log('Polling error:', e);
         }
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+import app as app_module
+import database
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.close_connections()
+    database.setup_database()
+    (tmp_path / 'uploads').mkdir()
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(tmp_path / 'uploads'))
+    # skip init_app: no job workers or model preloading unless a test installs a queue
+    monkeypatch.setattr(app_module, 'job_queue', object())
+    yield app_module.app.test_client()
+    database.close_connections()
+
+
+def test_request_closes_its_connection(client):
+    assert client.get('/duplicates').status_code == 200
+    assert database._local.conns == {}
+
+
+def test_identical_reupload_is_listed_as_duplicate(client, monkeypatch):
+    from core import jobs
+
+    monkeypatch.setattr(jobs, 'get_or_extract_text', lambda path, content_hash=None: (
+        "ACME TRADERS PVT LTD\nGSTIN: 27ABCDE1234F1Z5\nInvoice No: INV-77\nGrand Total 1180.00\n"))
+    queue = jobs.JobQueue(workers=1)
+    monkeypatch.setattr(app_module, 'job_queue', queue)
+    assert client.post('/upload', data={'file': (io.BytesIO(b'%PDF-1.4 same bytes'), 'a.pdf')}).status_code == 202
+    queue.shutdown()
+
+    response = client.post('/upload', data={'file': (io.BytesIO(b'%PDF-1.4 same bytes'), 'b.pdf')})
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'DUPLICATE'
+    clusters = client.get('/duplicates').get_json()['clusters']
+    assert len(clusters) == 1
+    assert clusters[0]['original']['filename'] == 'a.pdf'
+    assert [d['filename'] for d in clusters[0]['duplicates']] == ['b.pdf']
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+import database
+from database import WriteBehindError, WriteBehindWriter
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_name = str(tmp_path / 'invoices.db')
+    database.setup_database(db_name)
+    return db_name
+
+
+@pytest.fixture
+def default_db(tmp_path, monkeypatch):
+    """A fresh database under the default name, which the job runner uses"""
+    monkeypatch.chdir(tmp_path)
+    # this thread's cached connection may point at another test's directory
+    database.close_connections()
+    database.setup_database()
+    return 'invoices.db'
+
+
+def _row(file_path, **fields):
+    return database._invoice_params(dict(fields, file_path=file_path, processing_tier='RegexOnly'))
+
+
+def test_failed_batch_is_reported_by_flush(db, monkeypatch):
+    def fail(db_name, rows, history=None):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(database, '_write_invoices', fail)
+    writer = WriteBehindWriter(batch_wait=0.01)
+    writer.submit(db, _row('uploads/a.pdf'))
+    writer.submit(db, _row('uploads/b.pdf'))
+    with pytest.raises(WriteBehindError) as excinfo:
+        writer.flush(5)
+    assert set(excinfo.value.failures) == {'uploads/a.pdf', 'uploads/b.pdf'}
+    assert 'disk I/O error' in excinfo.value.failures['uploads/a.pdf']
+    assert writer.stats()['rows_failed'] == 2
+    # reported once
+    assert writer.flush(5) is True
+
+
+def test_failed_batch_is_retried_row_by_row(db, monkeypatch):
+    write = database._write_invoices
+
+    def fail_on_bad(db_name, rows, history=None):
+        if any(r['file_path'] == 'uploads/bad.pdf' for r in rows):
+            raise RuntimeError('constraint failed')
+        return write(db_name, rows, history)
+
+    monkeypatch.setattr(database, '_write_invoices', fail_on_bad)
+    writer = WriteBehindWriter(batch_wait=0.05)
+    writer.submit(db, _row('uploads/good.pdf', vendor_name='ACME'))
+    writer.submit(db, _row('uploads/bad.pdf'))
+    with pytest.raises(WriteBehindError) as excinfo:
+        writer.flush(5)
+    assert list(excinfo.value.failures) == ['uploads/bad.pdf']
+    assert database.get_result_by_filename('good.pdf', db)['vendor_name'] == 'ACME'
+    assert database.get_result_by_filename('bad.pdf', db) is None
+
+
+def test_failure_is_reported_to_the_submitting_thread_only(db, monkeypatch):
+    def fail(db_name, rows, history=None):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(database, '_write_invoices', fail)
+    writer = WriteBehindWriter(batch_wait=0.01)
+    errors = []
+
+    def submit_and_flush():
+        writer.submit(db, _row('uploads/a.pdf'))
+        try:
+            writer.flush(5)
+        except WriteBehindError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=submit_and_flush)
+    t.start()
+    t.join()
+    assert len(errors) == 1
+    assert writer.flush(5) is True
+
+
+def test_flush_writes_raises_for_save_to_db(db, monkeypatch):
+    def fail(db_name, rows, history=None):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(database, 'DB_WRITE_BEHIND', True)
+    monkeypatch.setattr(database, '_write_invoices', fail)
+    database.save_to_db({'file_path': 'uploads/a.pdf', 'processing_tier': 'RegexOnly'}, db)
+    with pytest.raises(WriteBehindError):
+        database.flush_writes(5)
+
+
+def test_job_with_unsaved_result_is_failed(default_db, monkeypatch):
+    from core import jobs
+
+    def fail(db_name, rows, history=None):
+        raise RuntimeError('disk I/O error')
+
+    monkeypatch.setattr(jobs, 'file_sha256', lambda path: 'hash')
+    monkeypatch.setattr(jobs, 'get_or_extract_text', lambda path, content_hash=None: (
+        "ACME TRADERS PVT LTD\nGSTIN: 27ABCDE1234F1Z5\nInvoice No: INV-77\nGrand Total 1180.00\n"))
+    monkeypatch.setattr(database, 'DB_WRITE_BEHIND', True)
+    monkeypatch.setattr(database, '_write_invoices', fail)
+    database.create_job('job-1', 'uploads/a.pdf')
+    jobs.run_jobs([('job-1', 'uploads/a.pdf', None)])
+    job = database.get_job('job-1')
+    assert job['state'] == 'failed'
+    assert 'disk I/O error' in job['error']
+
+
+def test_crashed_group_only_fails_unfinished_jobs(default_db, monkeypatch):
+    from core import jobs
+
+    def crash(batch):
+        for job_id, file_path, _ in batch:
+            if file_path.endswith('a.pdf'):
+                database.update_job_state(job_id, 'done')
+        raise RuntimeError('worker crashed')
+
+    monkeypatch.setattr(jobs, 'run_jobs', crash)
+    queue = jobs.JobQueue(workers=1)
+    done_id = queue.submit('uploads/a.pdf')
+    crashed_id = queue.submit('uploads/b.pdf')
+    queue.shutdown()
+    assert database.get_job(done_id)['state'] == 'done'
+    assert database.get_job(crashed_id)['state'] == 'failed'
+    assert database.get_job(crashed_id)['error'] == 'worker crashed'
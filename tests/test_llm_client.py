@@ -0,0 +1,166 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.llm_stub import start_stub
+from core.circuit import CircuitBreaker
+from core.llm_client import LLMClient
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "Invoice Text:\nINV-1001"}], "temperature": 0}
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server, state = start_stub(**options)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(url, **options):
+    options.setdefault('backoff_base', 0.01)
+    options.setdefault('backoff_max', 5.0)
+    return LLMClient(url=url, **options)
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retries_on_retryable_status(stub, status):
+    url, state = stub(fail_first=2, fail_status=status)
+    client = _client(url, max_retries=3)
+    data = client.chat_completion(PAYLOAD, 'key')
+    assert data['choices'][0]['message']['content']
+    assert state.requests == 3
+    assert client.retries == 2
+
+
+def test_gives_up_after_max_retries(stub):
+    url, state = stub(fail_first=10, fail_status=503)
+    client = _client(url, max_retries=2, breaker_failures=10)
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert state.requests == 3
+
+
+def test_client_error_is_not_retried(stub):
+    url, state = stub(fail_first=10, fail_status=400, retry_after='')
+    client = _client(url, max_retries=3, breaker_failures=1)
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert state.requests == 1
+    # the server answered, so the breaker stays closed
+    assert client.breaker.state == 'closed'
+
+
+def test_retry_after_is_honoured(stub):
+    url, state = stub(fail_first=1, fail_status=429, retry_after='1')
+    client = _client(url, max_retries=1)
+    t0 = time.monotonic()
+    assert client.chat_completion(PAYLOAD, 'key') is not None
+    assert time.monotonic() - t0 >= 1.0
+    assert state.requests == 2
+
+
+def test_retry_after_beyond_backoff_max_gives_up(stub):
+    url, state = stub(fail_first=1, fail_status=429, retry_after='30')
+    client = _client(url, max_retries=3, backoff_max=1.0)
+    t0 = time.monotonic()
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert time.monotonic() - t0 < 1.0
+    assert state.requests == 1
+
+
+def test_in_flight_cap(stub):
+    url, state = stub(delay=0.1)
+    client = _client(url, max_in_flight=3)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(lambda _: client.chat_completion(PAYLOAD, 'key'), range(12)))
+    assert all(results)
+    assert state.max_in_flight == 3
+
+
+def test_connect_and_read_timeouts_are_passed(stub):
+    url, _ = stub()
+    client = _client(url, connect_timeout=1.5, read_timeout=7.0)
+    seen = []
+    post = client.session.post
+
+    def spy(*args, **kwargs):
+        seen.append(kwargs.get('timeout'))
+        return post(*args, **kwargs)
+
+    client.session.post = spy
+    assert client.chat_completion(PAYLOAD, 'key') is not None
+    assert seen == [(1.5, 7.0)]
+
+
+def test_read_timeout_is_retried(stub):
+    url, state = stub(delay=0.5)
+    client = _client(url, read_timeout=0.1, max_retries=1, breaker_failures=10)
+    t0 = time.monotonic()
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert time.monotonic() - t0 < 0.5 * 2
+    assert client.requests_sent == 2
+
+
+def test_breaker_opens_then_lets_one_probe_through(stub):
+    url, state = stub(fail_first=2, fail_status=503, delay=0.2)
+    client = _client(url, max_retries=0, breaker_failures=2, breaker_cooldown=0.3)
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert client.breaker.state == 'closed'
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert client.breaker.state == 'open'
+
+    # open: refused without a request
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert state.requests == 2
+    assert client.breaker.short_circuited == 1
+
+    # half-open: of several concurrent callers only one probe reaches the server
+    time.sleep(0.3)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: client.chat_completion(PAYLOAD, 'key'), range(4)))
+    assert state.requests == 3
+    assert sum(1 for r in results if r) == 1
+    assert client.breaker.state == 'closed'
+    assert client.chat_completion(PAYLOAD, 'key') is not None
+
+
+def test_failed_probe_reopens_the_circuit(stub):
+    url, state = stub(fail_first=10, fail_status=503)
+    client = _client(url, max_retries=3, breaker_failures=1, breaker_cooldown=0.1)
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert client.breaker.state == 'open'
+    sent = state.requests
+    time.sleep(0.1)
+    # the probe gets a single attempt, no retries
+    assert client.chat_completion(PAYLOAD, 'key') is None
+    assert state.requests == sent + 1
+    assert client.breaker.state == 'open'
+
+
+def test_breaker_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.acquire() is None
+    time.sleep(0.05)
+    modes = []
+    barrier = threading.Barrier(8)
+
+    def acquire():
+        barrier.wait()
+        modes.append(breaker.acquire())
+
+    threads = [threading.Thread(target=acquire) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert modes.count('probe') == 1
+    assert modes.count(None) == 7
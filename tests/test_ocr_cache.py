@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from core.ocr_cache import OCRCache
+
+
+def _disk_size(cache_dir):
+    return sum(e.stat().st_size for e in os.scandir(cache_dir) if e.name.endswith('.json'))
+
+
+def test_existing_entries_are_counted_at_startup(tmp_path):
+    OCRCache(str(tmp_path), 1 << 20, 1 << 20).put('a', {'raw_text': 'x' * 100})
+    assert OCRCache(str(tmp_path), 1 << 20, 1 << 20).stats()['disk_bytes'] == _disk_size(tmp_path)
+
+
+def test_overwrite_does_not_inflate_disk_bytes(tmp_path):
+    cache = OCRCache(str(tmp_path), 1 << 20, 1 << 20)
+    for _ in range(5):
+        cache.put('a', {'raw_text': 'x' * 100})
+    assert cache.stats()['disk_bytes'] == _disk_size(tmp_path)
+
+
+def test_eviction_keeps_disk_within_budget(tmp_path):
+    cache = OCRCache(str(tmp_path), 1 << 20, 1000)
+    for i in range(20):
+        cache.put(f'k{i}', {'raw_text': 'x' * 200})
+    assert cache.stats()['disk_bytes'] == _disk_size(tmp_path) <= 1000
+    # the newest entry survives
+    assert os.path.exists(os.path.join(str(tmp_path), 'k19.json'))
+
+
+def test_known_content_hash_is_not_recomputed(tmp_path, monkeypatch):
+    from core import ocr_cache
+
+    cache = OCRCache(str(tmp_path), 1 << 20, 1 << 20)
+    cache.put(cache.key_for_hash('h'), {'raw_text': 'cached'})
+    monkeypatch.setattr(ocr_cache, '_ocr_cache', cache)
+    monkeypatch.setattr(ocr_cache, 'file_sha256', lambda path: pytest.fail('file was hashed again'))
+    assert ocr_cache.cached_process_with_doctr('uploads/a.pdf', 'h')['raw_text'] == 'cached'
+    assert ocr_cache.cached_process_with_doctr_batch(['uploads/a.pdf'], content_hashes=['h'])[0]['raw_text'] == 'cached'
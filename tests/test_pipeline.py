@@ -0,0 +1,44 @@
+import pytest
+
+import database
+from core import pipeline
+
+GSTIN = '29AAACA0001B1Z2'
+CANONICAL = 'Acme Traders Private Limited'
+# a vendor GSTIN verified before, but no total, so the document goes on to DocTR
+TEXT = f"ACME TRADERS PVT LTD\nGSTIN: {GSTIN}\nInvoice No: INV-77\n"
+
+
+@pytest.fixture
+def known_vendor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.close_connections()
+    database.setup_database()
+    # written on this thread, not by the write-behind thread's connection to an earlier test's database
+    monkeypatch.setattr(database, 'DB_WRITE_BEHIND', False)
+    monkeypatch.setattr(pipeline.vendor_master, 'lookup', lambda gstin: CANONICAL if gstin == GSTIN else None)
+
+
+def _run():
+    pipeline.run_full_pipeline('uploads/a.pdf', TEXT)
+    database.flush_writes()
+    return database.get_result_by_filename('a.pdf')
+
+
+def test_known_vendor_survives_doctr_merge(known_vendor, monkeypatch):
+    monkeypatch.setattr(pipeline, 'run_doctr_and_combine', lambda path, text, content_hash=None: (
+        {'vendor_name': 'ACME TRADERS', 'total_amount': 1180.0}, text + "Grand Total 1180.00\n"))
+    result = _run()
+    assert result['processing_tier'] == 'Regex+DocTR'
+    assert result['vendor_name'] == CANONICAL
+
+
+def test_known_vendor_survives_qa_and_llm_merges(known_vendor, monkeypatch):
+    monkeypatch.setattr(pipeline, 'run_doctr_and_combine', lambda path, text, content_hash=None: ({}, text))
+    monkeypatch.setattr(pipeline, 'process_with_text_qa', lambda text: {'vendor_name': 'ACME TRADERS PVT'})
+    monkeypatch.setattr(pipeline, 'process_with_llm', lambda text: {
+        'vendor_name': 'Acme Trading Co', 'invoice_number': 'INV-77', 'vendor_gstin': GSTIN,
+        'total_amount': 1180.0, 'processing_tier': 'LLM'})
+    result = _run()
+    assert result['processing_tier'] == 'LLM'
+    assert result['vendor_name'] == CANONICAL